@@ -0,0 +1,78 @@
+"""
+Аналітика історії графіків (NumPy)
+- матриця днів × груп × півгодинних слотів
+- ймовірність відключення по групі, дню тижня і слоту
+- прогноз вікон відключень для днів без опублікованого графіка
+"""
+
+from datetime import datetime
+
+import numpy as np
+
+SLOTS = 48
+SLOT_MINUTES = 30
+MASK_BYTES = SLOTS * SLOT_MINUTES // 8
+
+
+def masks_to_slots(masks):
+    """Хвилинні маски (int, 1440 біт) -> bool масив [n, 48]. Слот без світла, якщо хоч одна хвилина без світла"""
+    if not masks:
+        return np.zeros((0, SLOTS), dtype=bool)
+    raw = np.frombuffer(b"".join(m.to_bytes(MASK_BYTES, "little") for m in masks), dtype=np.uint8)
+    bits = np.unpackbits(raw.reshape(len(masks), MASK_BYTES), axis=1, bitorder="little")
+    return bits.reshape(len(masks), SLOTS, SLOT_MINUTES).any(axis=2)
+
+
+def history_matrix(days, groups):
+    """{"dd.mm.yyyy": {група: маска}} -> (дати, bool матриця [днів, груп, 48])
+
+    Група, якої немає в дні, вважається без відключень — так само, як у schedule.json.
+    """
+    dates = sorted(days, key=lambda d: datetime.strptime(d, "%d.%m.%Y"))
+    group_index = {g: i for i, g in enumerate(groups)}
+
+    matrix = np.zeros((len(dates), len(groups), SLOTS), dtype=bool)
+    cells, masks = [], []
+    for d, date in enumerate(dates):
+        for group, mask in days[date].items():
+            if group in group_index and mask:
+                cells.append((d, group_index[group]))
+                masks.append(mask)
+
+    if masks:
+        idx = np.array(cells)
+        matrix[idx[:, 0], idx[:, 1]] = masks_to_slots(masks)
+
+    return [datetime.strptime(d, "%d.%m.%Y").date() for d in dates], matrix
+
+
+def outage_probabilities(dates, matrix):
+    """Ймовірність відключення [груп, 7, 48] по дню тижня (0=пн)
+
+    Для днів тижня без жодного спостереження береться середнє по всіх днях.
+    """
+    weekdays = np.array([d.weekday() for d in dates], dtype=np.int64)
+    onehot = np.zeros((len(dates), 7))
+    onehot[np.arange(len(dates)), weekdays] = 1.0
+
+    counts = onehot.sum(axis=0)
+    totals = np.einsum("dw,dgs->gws", onehot, matrix.astype(np.float64))
+    overall = matrix.mean(axis=0) if len(dates) else np.zeros(matrix.shape[1:])
+
+    probs = np.where(counts[None, :, None] > 0, totals / np.maximum(counts, 1)[None, :, None], overall[:, None, :])
+    return probs
+
+
+def forecast(days, groups, targets, threshold=0.5):
+    """Прогноз для дат targets ("dd.mm.yyyy"). Повертає {дата: {група: [48 bool]}}, лише групи з відключеннями"""
+    dates, matrix = history_matrix(days, groups)
+    if not dates:
+        return {}
+
+    probs = outage_probabilities(dates, matrix)
+    result = {}
+    for target in targets:
+        weekday = datetime.strptime(target, "%d.%m.%Y").weekday()
+        likely = probs[:, weekday, :] >= threshold
+        result[target] = {g: likely[i].tolist() for i, g in enumerate(groups) if likely[i].any()}
+    return result
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Офлайн-перевірка HTTP-шляху DTEK на записаних fixtures/
+- parse_dtek_page + fact_hours_to_slots на dtek_page.html дають очікувані 48 слотів (dtek_expected.json)
+- ті самі години, намальовані класами клітинок сайту, через cell_classes_to_slots (як parse_schedule)
+  дають ті самі слоти — HTTP і Selenium шляхи не розходяться
+- fetch_dtek_schedule_http проти локальних заглушок публікує ці слоти для груп DTEK
+
+Запуск: python benchmarks/check_fixtures.py (код виходу 1, якщо щось не збіглось)
+"""
+
+import os
+import sys
+import json
+import tempfile
+
+from run import ROOT, FIXTURES, load_fixture, start_server
+
+# Як сайт малює значення fact у таблиці (клас клітинки td)
+FACT_CELL_CLASSES = {
+    "yes": "cell-non-scheduled",
+    "no": "cell-scheduled",
+    "first": "cell-first-half",
+    "second": "cell-second-half",
+    "maybe": "cell-scheduled-maybe",
+}
+
+
+def bits(slots):
+    return "".join("1" if s else "0" for s in slots)
+
+
+def check(update):
+    """Список розбіжностей (порожній — все збіглось)"""
+    errors = []
+    expected = json.loads(load_fixture("dtek_expected.json"))
+
+    fact, _, _ = update.parse_dtek_page(load_fixture("dtek_page.html").decode("utf-8"))
+    if not fact or not fact.get("data"):
+        return ["dtek_page.html: DisconSchedule.fact не знайдено"]
+    today_key, tomorrow_key = update.fact_days(fact)
+    days = {"today": today_key, "tomorrow": tomorrow_key}
+
+    for queue, by_day in expected.items():
+        for day, want in by_day.items():
+            hours = fact["data"].get(days[day], {}).get(queue)
+            if hours is None:
+                errors.append(f"{queue} {day}: немає у fact")
+                continue
+
+            got = bits(update.fact_hours_to_slots(hours))
+            if got != want:
+                errors.append(f"{queue} {day}: fact {got} != {want}")
+
+            classes = [FACT_CELL_CLASSES.get(hours.get(str(h + 1)), "") for h in range(24)]
+            cells = bits(update.cell_classes_to_slots(classes))
+            if cells != want:
+                errors.append(f"{queue} {day}: таблиця {cells} != {want}")
+
+    # Весь HTTP-шлях: сторінка і AJAX черг із заглушок
+    session = update.http_session()
+    result = update.fetch_dtek_schedule_http(session, update.fetch_dtek_page(session), {})
+    for group in update.DTEK_GROUPS:
+        if group in result["missing"]:
+            errors.append(f"{group}: HTTP-шлях не віддав групу")
+            continue
+        for day in ("today", "tomorrow"):
+            want = expected[f"GPV{group}"][day]
+            got = result[day].get(group, 0)
+            if got != update.slots_to_mask([c == "1" for c in want]):
+                errors.append(f"{group} {day}: HTTP {update.mask_to_intervals(got)}")
+
+    return errors
+
+
+def main():
+    server = start_server()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    os.environ["DTEK_URL"] = f"{base}/ua/shutdowns"
+    os.environ["DTEK_AJAX_URL"] = f"{base}/ua/ajax"
+    os.environ["CACHE_DIR"] = tempfile.mkdtemp(prefix="check-cache-")
+
+    sys.path.insert(0, ROOT)
+    import update
+
+    try:
+        errors = check(update)
+    finally:
+        server.shutdown()
+
+    for error in errors:
+        print(f"❌ {error}")
+    if errors:
+        sys.exit(1)
+    print(f"✅ Fixtures ({os.path.relpath(FIXTURES, ROOT)}): HTTP-шлях і таблиця збігаються з очікуваним")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""
+Офлайн-бенчмарк парсера
+- локальний HTTP-сервер віддає записані сторінку DTEK, відповідь AJAX і JSON YASNO з fixtures/
+- update.py дивиться на нього через DTEK_URL / DTEK_AJAX_URL / YASNO_API
+- таймінги по етапах + мікробенчмарки інтервальних функцій і історії
+- результат — JSON (stdout або --output), щоб порівнювати між комітами
+
+Запуск: python benchmarks/run.py [--selenium] [--repeat 5] [--output bench.json]
+"""
+
+import os
+import sys
+import json
+import random
+import argparse
+import tempfile
+import statistics
+import subprocess
+import threading
+import time
+import contextlib
+from datetime import date, timedelta
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import parse_qs
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+def load_fixture(name):
+    with open(os.path.join(FIXTURES, name), "rb") as f:
+        return f.read()
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Локальні заглушки DTEK (сторінка + AJAX getHomeNum) і YASNO API"""
+
+    page = load_fixture("dtek_page.html")
+    ajax = json.loads(load_fixture("dtek_ajax.json"))
+    yasno = load_fixture("yasno.json")
+    yasno_etag = '"bench-yasno"'
+
+    def log_message(self, *args):
+        pass
+
+    def send(self, status, body=b"", content_type="application/json", headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.startswith("/ua/shutdowns"):
+            self.send(200, self.page, "text/html; charset=utf-8")
+        elif self.path.startswith("/yasno"):
+            if self.headers.get("If-None-Match") == self.yasno_etag:
+                self.send(304, headers={"ETag": self.yasno_etag})
+            else:
+                self.send(200, self.yasno, headers={"ETag": self.yasno_etag})
+        else:
+            self.send(404)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        form = parse_qs(self.rfile.read(length).decode("utf-8"))
+        street = (form.get("data[1][value]") or [""])[0]
+        body = json.dumps({"result": True, "data": self.ajax.get(street, {})}, ensure_ascii=False)
+        self.send(200, body.encode("utf-8"))
+
+
+def start_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def measure(fn, repeat):
+    """Запускає fn repeat разів (вивід update.py глушиться). Повертає статистику в мс"""
+    times = []
+    value = None
+    for _ in range(repeat):
+        with contextlib.redirect_stdout(open(os.devnull, "w")):
+            start = time.perf_counter()
+            value = fn()
+            times.append((time.perf_counter() - start) * 1000)
+    stats = {
+        "runs": repeat,
+        "min_ms": round(min(times), 3),
+        "median_ms": round(statistics.median(times), 3),
+        "max_ms": round(max(times), 3),
+    }
+    return stats, value
+
+
+def synthetic_slots(rng, n):
+    return [[rng.random() < 0.3 for _ in range(48)] for _ in range(n)]
+
+
+def synthetic_intervals(rng, n):
+    """Невідсортовані інтервали з перетинами — найгірший випадок для merge"""
+    result = []
+    for _ in range(n):
+        ivs = []
+        for _ in range(12):
+            start = rng.randrange(0, 47) * 30
+            end = min(1440, start + rng.choice([30, 60, 90, 120, 240]))
+            ivs.append(f"{start // 60:02d}:{start % 60:02d}-{end // 60:02d}:{end % 60:02d}")
+        result.append(ivs)
+    return result
+
+
+def bench_stages(update, repeat, selenium):
+    """Етапи реального запуску проти локальних заглушок"""
+    results = {}
+    session = update.http_session()
+
+    results["dtek_page_load"], page = measure(lambda: session.get(update.DTEK_URL, timeout=30).text, repeat)
+    results["dtek_page_parse"], parsed = measure(lambda: update.parse_dtek_page(page), repeat)
+    results["dtek_http_resolve"], dtek = measure(lambda: update.fetch_dtek_schedule_http(session, parsed), repeat)
+    results["yasno_api_fetch"], yasno = measure(lambda: update.fetch_yasno_schedule({}), repeat)
+
+    result = update.new_result(update.datetime.now())
+    for name, data in (("dtek", dtek), ("yasno", yasno)):
+        data.pop("missing", None)
+        update.merge_source(result, name, data, None)
+
+    results["serialization"], _ = measure(
+        lambda: json.dumps(update.serialize_result(result), ensure_ascii=False, indent=2), repeat
+    )
+
+    if selenium:
+        results["selenium"] = bench_selenium(update, repeat)
+
+    return results
+
+
+def chrome_rss_mb(update, driver):
+    """Сумарний RSS chromedriver і всіх процесів Chrome під ним (лише Linux, інакше None)"""
+    try:
+        total = 0
+        for pid in update.process_tree(driver.service.process.pid):
+            with open(f"/proc/{pid}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        total += int(line.split()[1])
+        return round(total / 1024, 1)
+    except Exception:
+        return None
+
+
+def bench_selenium_profile(update, repeat, lean):
+    """Етапи Selenium-шляху для одного профілю: старт браузера, завантаження сторінки, форма, парсинг"""
+    results = {}
+    results["driver_startup"], driver = measure(lambda: update.setup_driver(lean), 1)
+    address = next(iter(update.DTEK_GROUPS.values()))[0]
+    
+    try:
+        results["page_load"], _ = measure(lambda: update.load_dtek_page(driver), repeat)
+        results["form_fill"], filled = measure(lambda: (update.load_dtek_page(driver), update.fill_form(driver, address))[1], repeat)
+        results["parse"], slots = measure(lambda: update.parse_schedule(driver), repeat)
+        results["form_fill"]["ok"] = bool(filled[0])
+        results["parse"]["table_rendered"] = slots[0] is not None
+        results["chrome_rss_mb"] = chrome_rss_mb(update, driver)
+    finally:
+        update.quit_driver(driver)
+    
+    return results
+
+
+def bench_selenium(update, repeat):
+    """Повний і легкий профілі Chrome поруч — щоб бачити і прискорення, і що таблиця досі рендериться"""
+    results = {
+        "full": bench_selenium_profile(update, repeat, lean=False),
+        "lean": bench_selenium_profile(update, repeat, lean=True),
+    }
+    full, lean = results["full"]["page_load"]["median_ms"], results["lean"]["page_load"]["median_ms"]
+    results["page_load_speedup"] = round(full / lean, 2) if lean else None
+    return results
+
+
+def bench_micro(update, transitions, repeat, size):
+    """Мікробенчмарки на великих синтетичних вхідних даних"""
+    rng = random.Random(1)
+    slots = synthetic_slots(rng, size)
+    intervals = synthetic_intervals(rng, size)
+    results = {}
+
+    results["slots_to_intervals"], _ = measure(lambda: [update.slots_to_intervals(s) for s in slots], repeat)
+    results["merge_intervals"], _ = measure(lambda: [update.merge_intervals(ivs) for ivs in intervals], repeat)
+    results["sum_intervals"], _ = measure(lambda: [update.sum_intervals(ivs) for ivs in intervals], repeat)
+    # Статус групи в момент T по індексу перемикань (як у transitions.py для ботів)
+    result = update.new_result(update.datetime.now())
+    for day in ("today", "tomorrow"):
+        result[day]["groups"] = {g: update.slots_to_mask(rng.choice(slots)) for g in update.ALL_GROUPS}
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "transitions.json")
+        update.write_json_atomic(path, update.build_transition_index(result))
+        index = transitions.TransitionIndex(path)
+        moments = [index.current()["start"] + rng.randrange(2 * 86400) for _ in range(size)]
+        groups = [rng.choice(update.ALL_GROUPS) for _ in range(size)]
+        results["transition_status"], _ = measure(lambda: [index.status(g, t) for g, t in zip(groups, moments)], repeat)
+    
+    for stats in results.values():
+        stats["items"] = size
+
+    # save_history: рік щоденних записів по 12 групах у тимчасовий файл
+    with tempfile.TemporaryDirectory() as tmp:
+        update.HISTORY_FILE = os.path.join(tmp, "history.jsonl")
+        update.HISTORY_INDEX_FILE = update.HISTORY_FILE + ".idx"
+        update.LEGACY_HISTORY_FILE = os.path.join(tmp, "history.json")
+        days = [(date(2025, 1, 1) + timedelta(days=i)).strftime("%d.%m.%Y") for i in range(365)]
+
+        def save_year():
+            for day in days:
+                groups = {g: update.slots_to_intervals(rng.choice(slots)) for g in update.ALL_GROUPS}
+                update.save_history({"today": {"date": day, "groups": groups}, "updated": day})
+
+        results["save_history"], _ = measure(save_year, 1)
+        results["save_history"]["items"] = len(days)
+        results["load_history"], _ = measure(update.load_history, repeat)
+        results["load_history"]["items"] = len(days)
+        # Вікно прогнозу: останні FORECAST_WEEKS тижнів, як у add_forecast
+        start = (date(2025, 12, 31) - timedelta(weeks=update.FORECAST_WEEKS)).strftime("%d.%m.%Y")
+        results["load_history_window"], window = measure(lambda: update.load_history(start=start), repeat)
+        results["load_history_window"]["items"] = len(window)
+
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except Exception:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Офлайн-бенчмарк update.py")
+    parser.add_argument("--repeat", type=int, default=5, help="повторів кожного етапу")
+    parser.add_argument("--size", type=int, default=10000, help="розмір синтетичних вхідних даних")
+    parser.add_argument("--selenium", action="store_true", help="також заміряти Selenium-шлях (потрібен Chrome)")
+    parser.add_argument("--output", help="куди записати JSON (за замовчуванням stdout)")
+    args = parser.parse_args()
+
+    server = start_server()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    os.environ["DTEK_URL"] = f"{base}/ua/shutdowns"
+    os.environ["DTEK_AJAX_URL"] = f"{base}/ua/ajax"
+    os.environ["YASNO_API"] = f"{base}/yasno"
+    # Кеш відповідей, стан і файли для клієнтів — в тимчасових теках, щоб не чіпати checkout
+    os.environ["CACHE_DIR"] = tempfile.mkdtemp(prefix="bench-cache-")
+    os.environ["SCHEDULE_FILE"] = os.path.join(tempfile.mkdtemp(prefix="bench-out-"), "schedule.json")
+
+    sys.path.insert(0, ROOT)
+    import update
+    import transitions
+
+    report = {
+        "commit": git_commit(),
+        "python": sys.version.split()[0],
+        "stages": bench_stages(update, args.repeat, args.selenium),
+        "micro": bench_micro(update, transitions, args.repeat, args.size),
+    }
+    server.shutdown()
+
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Дедлайни запуску
+- RunClock: загальний бюджет запуску; джерела і групи міряють свій час від нього
+- Watchdog: один фоновий потік, що вбиває роботу (браузер), яка вийшла за свій бюджет —
+  завислий Chrome більше не тримає воркер, а з ним і весь запуск
+"""
+
+import math
+import time
+import threading
+from contextlib import contextmanager
+
+
+class RunClock:
+    """Дедлайн поточного запуску (monotonic). До start() — без обмежень"""
+
+    def __init__(self):
+        self.deadline = None
+
+    def start(self, seconds):
+        self.deadline = time.monotonic() + seconds
+
+    def remaining(self, reserve=0):
+        """Секунд до дедлайну мінус reserve (може бути від'ємним)"""
+        if self.deadline is None:
+            return math.inf
+        return self.deadline - reserve - time.monotonic()
+
+
+class Watchdog:
+    """guard(seconds, kill) — якщо блок не завершився за seconds, потік watchdog викликає kill()
+
+    kill() має зробити так, щоб заблокований виклик у воркері впав (наприклад, вбити процес браузера).
+    Після спрацювання job["killed"] = True — воркер знає, що його ресурс уже мертвий.
+    kill() виконується під тим самим замком, що і вихід з guard(): робота, яка завершилась
+    на межі дедлайну, або не буде вбита, або вийде з guard() вже з killed = True —
+    ресурс не вб'ють посеред наступної роботи.
+    """
+
+    def __init__(self, interval=1.0):
+        self.interval = interval
+        self.jobs = {}
+        self.lock = threading.Lock()
+        self.thread = None
+
+    @contextmanager
+    def guard(self, seconds, kill, name=None):
+        job = {"deadline": time.monotonic() + seconds, "kill": kill, "name": name, "killed": False}
+        with self.lock:
+            self.jobs[id(job)] = job
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self.loop, name="watchdog", daemon=True)
+                self.thread.start()
+        try:
+            yield job
+        finally:
+            with self.lock:
+                self.jobs.pop(id(job), None)
+
+    def loop(self):
+        while True:
+            time.sleep(self.interval)
+            now = time.monotonic()
+            with self.lock:
+                expired = [job for job in self.jobs.values() if now >= job["deadline"]]
+                for job in expired:
+                    del self.jobs[id(job)]
+                    job["killed"] = True
+                    try:
+                        job["kill"]()
+                    except Exception as e:
+                        print(f"    ⚠️ Watchdog {job['name']}: {e}")
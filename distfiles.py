@@ -0,0 +1,149 @@
+"""
+Файли для клієнтів (тека dist/ поруч із schedule.json)
+- schedule.min.json + .gz (+ .br, якщо встановлено brotli) — той самий зміст, мінімізований і стиснутий
+- groups/<група>.json — шард однієї групи: боту не треба тягнути весь графік
+- schedule.bin — компактне бінарне кодування 48 півгодинних слотів на день (див. encode_binary)
+- manifest.json — sha256 і розмір кожного файлу для умовних завантажень
+
+Файл переписується лише коли змінились його байти — незмінені шарди не дають git-комітів.
+"""
+
+import os
+import gzip
+import json
+import struct
+import hashlib
+from datetime import datetime, timedelta
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+SLOTS = 48
+SLOT_MINUTES = 30
+SLOT_BYTES = SLOTS // 8
+SLOT_FULL = (1 << SLOT_MINUTES) - 1
+
+# "BSC" + версія; дата "сьогодні" — proleptic ordinal; далі групи
+BINARY_MAGIC = b"BSC1"
+BINARY_HEADER = struct.Struct("<4sIB")
+
+
+def mask_to_slot_bits(mask):
+    """Хвилинна маска (1440 біт) -> 48 біт: слот без світла, якщо хоч одна хвилина без світла"""
+    bits = 0
+    for slot in range(SLOTS):
+        if (mask >> (slot * SLOT_MINUTES)) & SLOT_FULL:
+            bits |= 1 << slot
+    return bits
+
+
+def encode_binary(date, days, groups):
+    """Бінарний графік: заголовок (magic, ordinal дати, к-сть груп),
+    далі на групу: довжина назви (1 байт), назва (ASCII), 6 байт сьогодні, 6 байт завтра (біт i = слот i)
+
+    days — (маски сьогодні, маски завтра), {група: маска}. Точність — 30 хвилин.
+    """
+    ordinal = datetime.strptime(date, "%d.%m.%Y").toordinal()
+    parts = [BINARY_HEADER.pack(BINARY_MAGIC, ordinal, len(groups))]
+    for group in groups:
+        name = group.encode("ascii")
+        parts.append(bytes([len(name)]) + name)
+        for masks in days:
+            parts.append(mask_to_slot_bits(masks.get(group, 0)).to_bytes(SLOT_BYTES, "little"))
+    return b"".join(parts)
+
+
+def decode_binary(data):
+    """Зворотне до encode_binary: {"today": дата, "tomorrow": дата, "groups": {група: ([48 bool], [48 bool])}}"""
+    magic, ordinal, count = BINARY_HEADER.unpack_from(data)
+    if magic != BINARY_MAGIC:
+        raise ValueError("not a schedule.bin")
+
+    offset = BINARY_HEADER.size
+    groups = {}
+    for _ in range(count):
+        size = data[offset]
+        name = data[offset + 1:offset + 1 + size].decode("ascii")
+        offset += 1 + size
+        days = []
+        for _ in range(2):
+            bits = int.from_bytes(data[offset:offset + SLOT_BYTES], "little")
+            days.append([bool(bits >> i & 1) for i in range(SLOTS)])
+            offset += SLOT_BYTES
+        groups[name] = tuple(days)
+
+    today = datetime.fromordinal(ordinal)
+    return {
+        "today": today.strftime("%d.%m.%Y"),
+        "tomorrow": (today + timedelta(days=1)).strftime("%d.%m.%Y"),
+        "groups": groups,
+    }
+
+
+def minify(data):
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def group_shard(output, group):
+    """Шард групи: лише те, що потрібно боту для однієї групи. Без "updated" — щоб не змінювався даремно"""
+    shard = {"group": group, "timezone": output.get("timezone")}
+    for day in ("today", "tomorrow"):
+        shard[day] = {"date": output[day]["date"], "intervals": output[day]["groups"].get(group, [])}
+        since = output[day].get("stale_since", {}).get(group)
+        if since:
+            shard[day]["stale_since"] = since
+        if group in output[day].get("unpublished", []):
+            shard[day]["unpublished"] = True
+    for field in ("announcement", "emergency"):
+        if output.get(field):
+            shard[field] = output[field]
+    return shard
+
+
+def write_if_changed(path, data):
+    """Пише байти атомарно, якщо вони відрізняються від наявних. Повертає True, якщо записано"""
+    try:
+        with open(path, "rb") as f:
+            if f.read() == data:
+                return False
+    except FileNotFoundError:
+        pass
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+    return True
+
+
+def write_dist(directory, output, masks, groups):
+    """Пише всі клієнтські файли в directory. Повертає кількість реально переписаних файлів
+
+    output — серіалізований schedule.json, masks — (маски сьогодні, маски завтра), groups — порядок груп.
+    """
+    full = minify(output)
+    files = {
+        "schedule.min.json": full,
+        # mtime=0 — однаковий зміст дає однакові байти
+        "schedule.min.json.gz": gzip.compress(full, compresslevel=9, mtime=0),
+        "schedule.bin": encode_binary(output["today"]["date"], masks, groups),
+    }
+    if brotli is not None:
+        files["schedule.min.json.br"] = brotli.compress(full, quality=11)
+    for group in groups:
+        files[f"groups/{group}.json"] = minify(group_shard(output, group))
+
+    written = sum(write_if_changed(os.path.join(directory, name), data) for name, data in files.items())
+
+    manifest = {
+        "hash": output.get("hash"),
+        "files": {
+            name: {"sha256": hashlib.sha256(data).hexdigest(), "size": len(data)}
+            for name, data in files.items()
+        },
+    }
+    written += write_if_changed(os.path.join(directory, "manifest.json"), minify(manifest))
+    return written
@@ -0,0 +1,163 @@
+"""
+Спільний HTTP-шар
+- пул з'єднань: одна requests.Session з HTTPAdapter (keep-alive, gzip/deflate; br — якщо стоїть brotli)
+- обмежені повтори з експоненційним відступом на мережеві збої і 429/5xx (urllib3 Retry)
+- circuit breaker на хост: після кількох збоїв поспіль запити падають одразу, не чекаючи таймаутів
+- stale-while-revalidate: остання добра відповідь на диску віддається як застаріла,
+  поки свіжа ще вантажиться у фоні або джерело лежить
+"""
+
+import os
+import json
+import time
+import threading
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from metrics import METRICS
+
+
+class CircuitOpenError(requests.ConnectionError):
+    """Хост вимкнено breaker'ом — запит навіть не надсилався"""
+
+
+class CircuitBreaker:
+    """Розмикається після threshold збоїв поспіль; через cooldown секунд пропускає одну пробу (half-open)"""
+
+    def __init__(self, threshold=3, cooldown=60):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.lock = threading.Lock()
+        self.failures = {}
+        self.opened = {}
+
+    def before(self, host):
+        with self.lock:
+            opened = self.opened.get(host)
+            if opened is None:
+                return
+            if time.monotonic() - opened < self.cooldown:
+                raise CircuitOpenError(f"circuit open for {host}")
+            # Half-open: одна проба, решта чекає її результату ще один cooldown
+            self.opened[host] = time.monotonic()
+
+    def success(self, host):
+        with self.lock:
+            self.failures.pop(host, None)
+            self.opened.pop(host, None)
+
+    def failure(self, host):
+        with self.lock:
+            self.failures[host] = self.failures.get(host, 0) + 1
+            if self.failures[host] >= self.threshold and host not in self.opened:
+                self.opened[host] = time.monotonic()
+                METRICS.count("circuit_opened")
+                print(f"   🔌 {host}: {self.failures[host]} збоїв поспіль — пауза {self.cooldown}с")
+
+
+class ResilientSession(requests.Session):
+    """requests.Session з пулом, повторами, таймаутом за замовчуванням і circuit breaker"""
+
+    def __init__(self, user_agent=None, retries=2, backoff=0.5, timeout=(5, 15), pool_size=10, breaker=None):
+        super().__init__()
+        if user_agent:
+            self.headers["User-Agent"] = user_agent
+        self.timeout = timeout
+        self.breaker = breaker or CircuitBreaker()
+
+        # Retry-After ігнорується, щоб хвіст затримки визначали лише retries і backoff
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff,
+            status_forcelist=(429, 500, 502, 503, 504),
+            respect_retry_after_header=False,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(max_retries=retry, pool_connections=pool_size, pool_maxsize=pool_size)
+        self.mount("https://", adapter)
+        self.mount("http://", adapter)
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        host = urlsplit(url).netloc
+        self.breaker.before(host)
+        try:
+            response = super().request(method, url, **kwargs)
+        except requests.RequestException:
+            self.breaker.failure(host)
+            raise
+        if response.status_code >= 500 or response.status_code == 429:
+            self.breaker.failure(host)
+        else:
+            self.breaker.success(host)
+        return response
+
+
+class StaleWhileRevalidate:
+    """Дисковий кеш однієї відповіді: {"fetched": unix, ...довільні поля fetch()...}
+
+    get(fetch, wait) запускає fetch() у фоні. Якщо за wait секунд відповіді немає
+    або fetch() впав — повертає останній добрий запис із stale=True, а оновлення
+    (якщо ще йде) допише кеш для наступного запуску. Без кешу чекає fetch() до кінця.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.inflight = None
+
+    def load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def store(self, entry):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(entry, f, ensure_ascii=False)
+        os.replace(tmp, self.path)
+
+    def refresh(self, fetch, cached):
+        """Один фоновий запит на кеш: повторний get() чекає вже запущений"""
+        with self.lock:
+            if self.inflight is not None and not self.inflight["done"].is_set():
+                return self.inflight
+
+            job = {"done": threading.Event()}
+
+            def run():
+                try:
+                    entry = fetch(cached)
+                    entry["fetched"] = time.time()
+                    self.store(entry)
+                    job["entry"] = entry
+                except Exception as e:
+                    job["error"] = e
+                finally:
+                    job["done"].set()
+
+            self.inflight = job
+            threading.Thread(target=run, daemon=True).start()
+            return job
+
+    def get(self, fetch, wait):
+        """fetch(cached) -> новий запис (dict). Повертає (запис, stale)"""
+        cached = self.load()
+        job = self.refresh(fetch, cached)
+        job["done"].wait(wait if cached else None)
+
+        if "entry" in job:
+            return job["entry"], False
+        if cached is None:
+            raise job["error"]
+
+        reason = job["error"] if "error" in job else f"немає відповіді за {wait}с"
+        print(f"   ♻️ Застарілі дані з кешу ({reason})")
+        METRICS.count("stale_served")
+        return cached, True
@@ -0,0 +1,196 @@
+"""
+Легка інструментація запуску
+- вкладені спани часу: run → source → group → step
+- лічильники (ретраї, fallback автодоповнення, порожні таблиці...)
+- JSON-файл метрик поруч із schedule.json і, за бажанням, Prometheus textfile
+
+Вимкнені метрики (METRICS=0) повертають один спільний порожній спан — майже нульова ціна.
+"""
+
+import os
+import json
+import time
+import threading
+from collections import defaultdict
+
+
+class NullSpan:
+    """Спан-заглушка для вимкнених метрик"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def tag(self, **tags):
+        pass
+
+
+NULL_SPAN = NullSpan()
+
+
+class Span:
+    def __init__(self, metrics, name, tags, parent=None):
+        self.metrics = metrics
+        self.name = name
+        self.tags = tags
+        self.id = None
+        self.parent = parent.id if isinstance(parent, Span) else None
+        self.start = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        self.id, self.parent = self.metrics.open(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration = time.perf_counter() - self.start
+        if exc_type is not None:
+            self.tags.setdefault("outcome", "error")
+            self.tags.setdefault("error", f"{exc_type.__name__}: {exc}")
+        self.tags.setdefault("outcome", "ok")
+        self.metrics.close(self, duration)
+        return False
+
+    def tag(self, **tags):
+        self.tags.update(tags)
+
+
+class Metrics:
+    """Збирач спанів і лічильників одного процесу (потокобезпечний)"""
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.spans = []
+            self.counters = defaultdict(int)
+            self.root = None
+            self.next_id = 1
+            self.started = time.perf_counter()
+            self.started_at = time.time()
+
+    def span(self, name, parent=None, **tags):
+        """Спан часу. parent — явний батько для спанів у пулі потоків (див. current())"""
+        if not self.enabled:
+            return NULL_SPAN
+        return Span(self, name, tags, parent)
+
+    def current(self):
+        """Поточний спан цього потоку — щоб передати його як parent у воркери"""
+        stack = self.stack() if self.enabled else None
+        return stack[-1] if stack else NULL_SPAN
+
+    def count(self, name, value=1):
+        if self.enabled:
+            with self.lock:
+                self.counters[name] += value
+
+    def stack(self):
+        stack = getattr(self.local, "stack", None)
+        if stack is None:
+            stack = self.local.stack = []
+        return stack
+
+    def open(self, span):
+        stack = self.stack()
+        with self.lock:
+            span_id = self.next_id
+            self.next_id += 1
+            # Без явного батька спани з інших потоків чіпляються до кореневого спану запуску
+            parent = span.parent or (stack[-1].id if stack else (self.root.id if self.root else None))
+            if self.root is None and not stack and threading.current_thread() is threading.main_thread():
+                self.root = span
+        stack.append(span)
+        return span_id, parent
+
+    def close(self, span, duration):
+        stack = self.stack()
+        if stack and stack[-1] is span:
+            stack.pop()
+        record = {
+            "id": span.id,
+            "parent": span.parent,
+            "name": span.name,
+            "start_ms": round((span.start - self.started) * 1000, 3),
+            "duration_ms": round(duration * 1000, 3),
+            "tags": dict(span.tags),
+        }
+        with self.lock:
+            self.spans.append(record)
+            if self.root is span:
+                self.root = None
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                "started_at": self.started_at,
+                "spans": sorted(self.spans, key=lambda s: s["start_ms"]),
+                "counters": dict(self.counters),
+            }
+
+    def write(self, path, prom_path=None):
+        """Записує JSON з метриками і (опціонально) Prometheus textfile"""
+        if not self.enabled:
+            return
+        data = self.snapshot()
+
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, path)
+
+        if prom_path:
+            tmp = prom_path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(prometheus_text(data))
+            os.replace(tmp, prom_path)
+
+
+def prom_escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def prom_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{prom_escape(v)}"' for k, v in sorted(labels.items())) + "}"
+
+
+def prometheus_text(data):
+    """Спани агрегуються за (name, source, group, step, outcome) — сума і кількість; лічильники як *_total"""
+    sums = defaultdict(float)
+    counts = defaultdict(int)
+    for span in data["spans"]:
+        labels = {"name": span["name"]}
+        for key in ("source", "group", "step", "outcome"):
+            if key in span["tags"]:
+                labels[key] = span["tags"][key]
+        key = tuple(sorted(labels.items()))
+        sums[key] += span["duration_ms"] / 1000
+        counts[key] += 1
+
+    lines = [
+        "# HELP blackout_span_seconds Duration of update.py timing spans",
+        "# TYPE blackout_span_seconds summary",
+    ]
+    for key in sorted(sums):
+        labels = prom_labels(dict(key))
+        lines.append(f"blackout_span_seconds_sum{labels} {sums[key]:.6f}")
+        lines.append(f"blackout_span_seconds_count{labels} {counts[key]}")
+
+    for name, value in sorted(data["counters"].items()):
+        lines.append(f"# TYPE blackout_{name}_total counter")
+        lines.append(f"blackout_{name}_total {value}")
+
+    lines.append("# TYPE blackout_last_run_timestamp_seconds gauge")
+    lines.append(f"blackout_last_run_timestamp_seconds {data['started_at']:.0f}")
+    return "\n".join(lines) + "\n"
+
+
+METRICS = Metrics(enabled=os.getenv("METRICS", "1") == "1")
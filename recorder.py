@@ -0,0 +1,88 @@
+"""
+Бортовий самописець для Selenium-шляху
+- обмежене кільце дешевих записів: очікування і їх тривалість, селектори, fallback автодоповнення,
+  знімки класів клітинок, проковтнуті винятки
+- на диск (скріншот, HTML і кільце) — лише коли група впала, таблиця порожня або джерело не вклалось у дедлайн
+"""
+
+import os
+import json
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+
+
+class FlightRecorder:
+    """Кільце останніх size записів усіх потоків; кожен запис знає свою групу (context())"""
+
+    def __init__(self, directory="debug", size=500, max_dumps=5):
+        self.directory = directory
+        self.ring = deque(maxlen=size)
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.max_dumps = max_dumps
+        self.dumps = 0
+        self.started = time.perf_counter()
+
+    @contextmanager
+    def context(self, group):
+        previous = getattr(self.local, "group", None)
+        self.local.group = group
+        try:
+            yield
+        finally:
+            self.local.group = previous
+
+    def record(self, kind, **fields):
+        """Дешевий запис кроку; deque.append потокобезпечний, тож без блокування"""
+        self.ring.append({
+            "t": round(time.perf_counter() - self.started, 3),
+            "kind": kind,
+            "group": getattr(self.local, "group", None),
+            "thread": threading.current_thread().name,
+            **fields,
+        })
+
+    def reset(self):
+        with self.lock:
+            self.ring.clear()
+            self.dumps = 0
+            self.started = time.perf_counter()
+
+    def dump(self, reason, driver=None, group=None):
+        """Пише кільце (і скріншот + HTML, якщо є driver) у directory/<час>-<група>-<причина>/
+
+        Не більше max_dumps на запуск — масовий збій не повинен перетворитись на гігабайти скріншотів.
+        Повертає шлях або None.
+        """
+        group = group or getattr(self.local, "group", None)
+        with self.lock:
+            if self.dumps >= self.max_dumps:
+                return None
+            self.dumps += 1
+
+        name = f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{group or 'run'}-{reason}"
+        path = os.path.join(self.directory, name)
+        try:
+            os.makedirs(path, exist_ok=True)
+            with open(os.path.join(path, "ring.jsonl"), "w", encoding="utf-8") as f:
+                for entry in list(self.ring):
+                    # Записи інших груп лишаємо лише загальні (без групи) — решта тільки заважає
+                    if group is None or entry["group"] in (group, None):
+                        f.write(json.dumps(entry, ensure_ascii=False, default=str) + "\n")
+
+            if driver is not None:
+                try:
+                    driver.save_screenshot(os.path.join(path, "page.png"))
+                    with open(os.path.join(path, "page.html"), "w", encoding="utf-8") as f:
+                        f.write(driver.page_source)
+                except Exception as e:
+                    print(f"    ⚠️ Знімок сторінки не вдався: {e}")
+
+            print(f"    🧾 Самописець: {path}")
+            return path
+        except Exception as e:
+            print(f"    ⚠️ Recorder error: {e}")
+            return None
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Швидкі запити "чи є світло в момент T" по transitions.json
+- індекс тримається в пам'яті і перечитується, щойно файл змінився (hot reload)
+- статус, наступне перемикання і скільки ще чекати — bisect по межах, O(log n), без парсингу рядків
+- маленький HTTP-шар для ботів: GET /status/<група>?at=<unix>, GET /status?at=<unix>
+
+Запуск сервера: python transitions.py [--file transitions.json] [--port 8080]
+"""
+
+import os
+import json
+import time
+import bisect
+import argparse
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+
+TRANSITIONS_FILE = os.getenv("TRANSITIONS_FILE", "transitions.json")
+
+
+class TransitionIndex:
+    """Індекс перемикань з transitions.json (див. update.build_transition_index)
+
+    check_interval — як часто (сек) дивитись на mtime файлу; між перевірками запити не чіпають диск.
+    """
+
+    def __init__(self, path=TRANSITIONS_FILE, check_interval=1.0):
+        self.path = path
+        self.check_interval = check_interval
+        self.data = None
+        self.mtime = None
+        self.checked = 0.0
+
+    def reload(self):
+        """Перечитує файл, якщо він змінився. Повертає True, якщо індекс оновлено"""
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return False
+        if mtime == self.mtime:
+            return False
+
+        with open(self.path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        # Одне присвоєння — потоки сервера бачать або старий, або новий індекс цілком
+        self.data, self.mtime = data, mtime
+        return True
+
+    def current(self):
+        now = time.monotonic()
+        if now - self.checked >= self.check_interval:
+            self.checked = now
+            try:
+                self.reload()
+            except ValueError:
+                pass  # файл саме переписують — лишаємось на попередньому індексі
+        return self.data
+
+    def groups(self):
+        data = self.current()
+        return list(data["groups"]) if data else []
+
+    def status(self, group, at=None):
+        """Статус групи в момент at (unix, за замовчуванням зараз). None, якщо групи немає
+
+        power — True/False, або None поза вікном графіка групи (раніше start або з ends[група]:
+        далі її графік не опубліковано). since / next_change — найближчі межі (None, якщо за межами вікна);
+        remaining — секунд до next_change.
+        """
+        data = self.current()
+        if not data or group not in data["groups"]:
+            return None
+
+        at = int(time.time() if at is None else at)
+        bounds = data["groups"][group]
+        end = data.get("ends", {}).get(group, data["end"])
+        known = data["start"] <= at < end
+
+        i = bisect.bisect_right(bounds, at)
+        since = bounds[i - 1] if i else None
+        next_change = bounds[i] if i < len(bounds) else None
+
+        return {
+            "group": group,
+            "at": at,
+            "power": (i % 2 == 0) if known else None,
+            "since": since if known else None,
+            "next_change": next_change if known else None,
+            "remaining": next_change - at if known and next_change is not None else None,
+            "known_until": end,
+        }
+
+
+class QueryHandler(BaseHTTPRequestHandler):
+    index = None
+
+    def log_message(self, *args):
+        pass
+
+    def send_json(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        query = parse_qs(url.query)
+        try:
+            at = int(query["at"][0]) if "at" in query else None
+        except ValueError:
+            return self.send_json(400, {"error": "at must be a unix timestamp"})
+
+        parts = [p for p in url.path.split("/") if p]
+        if parts == ["status"]:
+            return self.send_json(200, {g: self.index.status(g, at) for g in self.index.groups()})
+        if len(parts) == 2 and parts[0] == "status":
+            status = self.index.status(parts[1], at)
+            if status is None:
+                return self.send_json(404, {"error": f"unknown group {parts[1]}"})
+            return self.send_json(200, status)
+        self.send_json(404, {"error": "not found"})
+
+
+def serve(index, host="127.0.0.1", port=8080):
+    handler = type("Handler", (QueryHandler,), {"index": index})
+    server = ThreadingHTTPServer((host, port), handler)
+    print(f"🌐 http://{host}:{server.server_address[1]}/status/<група>")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Запити статусу світла по transitions.json")
+    parser.add_argument("--file", default=TRANSITIONS_FILE, help="шлях до transitions.json")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    args = parser.parse_args()
+
+    serve(TransitionIndex(args.file), args.host, args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -6,50 +6,256 @@ DTEK + YASNO Schedule Parser
 """
 
 import os
+import re
+import copy
+import random
+import argparse
 import json
 import time
-import requests
+import queue
+import signal
+import hashlib
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+from html.parser import HTMLParser
+from zoneinfo import ZoneInfo
 
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.by import By
-from selenium.webdriver.common.keys import Keys
-from selenium.webdriver.common.action_chains import ActionChains
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
+# Selenium потрібен лише як запасний шлях для DTEK
+try:
+    from selenium import webdriver
+    from selenium.webdriver.chrome.options import Options
+    from selenium.webdriver.chrome.service import Service
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.common.keys import Keys
+    from selenium.webdriver.common.action_chains import ActionChains
+    from selenium.webdriver.support.ui import WebDriverWait
+    from selenium.webdriver.support import expected_conditions as EC
+    from selenium.common.exceptions import TimeoutException
+except ImportError:
+    webdriver = None
 
-DTEK_URL = "https://www.dtek-dnem.com.ua/ua/shutdowns"
-YASNO_API = "https://api.yasno.com.ua/api/v1/pages/home/schedule-turn-off-electricity"
+from metrics import METRICS
+from http_client import ResilientSession, CircuitBreaker, StaleWhileRevalidate
+from distfiles import write_dist
+from recorder import FlightRecorder
+from deadline import RunClock, Watchdog
+
+# NumPy потрібен лише для прогнозу
+try:
+    import analytics
+except ImportError:
+    analytics = None
+
+# Адреси джерел можна підмінити (напр. локальні заглушки з benchmarks/)
+DTEK_URL = os.getenv("DTEK_URL", "https://www.dtek-dnem.com.ua/ua/shutdowns")
+DTEK_AJAX_URL = os.getenv("DTEK_AJAX_URL", "https://www.dtek-dnem.com.ua/ua/ajax")
+YASNO_API = os.getenv("YASNO_API", "https://api.yasno.com.ua/api/v1/pages/home/schedule-turn-off-electricity")
 CITY = "м. Дніпро"
+ADDRESSES_FILE = os.getenv("ADDRESSES_FILE", "addresses.json")
 SCHEDULE_FILE = os.getenv("SCHEDULE_FILE", "schedule.json")
 
-# DTEK групи (парсимо через Selenium)
-DTEK_GROUPS = {
-    "1.1": "пров. Парковий",
-    "1.2": "вул. Мохова",
-    "3.1": "вул. Центральна",
-    "3.2": "вул. Холодильна",
-    "5.1": "пров. Морський",
-    "5.2": "вул. Автодорожна",
+# Службові файли між запусками (не комітяться; в CI зберігаються через actions/cache)
+CACHE_DIR = os.getenv("CACHE_DIR", ".cache")
+STATE_FILE = os.path.join(CACHE_DIR, "state.json")
+
+# Останні добрі дані кожної групи по днях — на випадок, якщо джерело не віддало групу
+GROUP_CACHE_FILE = os.path.join(CACHE_DIR, "groups.json")
+
+# Кеш адреса -> черга (AJAX getHomeNum); запис старший за TTL перевіряється знову
+ADDRESS_CACHE_FILE = os.path.join(CACHE_DIR, "addresses.json")
+ADDRESS_CACHE_TTL = int(os.getenv("ADDRESS_CACHE_TTL", str(7 * 24 * 3600)))
+
+# Стрічка змін графіка (JSONL) для нотифікаторів; поля, що не впливають на зміст, не входять у хеш
+CHANGES_FILE = os.path.join(os.path.dirname(SCHEDULE_FILE), "changes.jsonl")
+VOLATILE_FIELDS = ("updated", "hash")
+
+# Самописець Selenium: скріншот, HTML і кільце кроків пишуться сюди лише при збоях
+DEBUG_DIR = os.getenv("DEBUG_DIR", "debug")
+
+# Мінімізовані/стиснуті/бінарні варіанти, шарди груп і маніфест (див. distfiles.py)
+DIST_DIR = os.path.join(os.path.dirname(SCHEDULE_FILE), "dist")
+
+# Індекс перемикань (абсолютні timestamps) для transitions.py і ботів
+TRANSITIONS_FILE = os.path.join(os.path.dirname(SCHEDULE_FILE), "transitions.json")
+KYIV = ZoneInfo("Europe/Kyiv")
+
+# Метрики запуску поруч із schedule.json; Prometheus textfile — лише якщо задано шлях
+METRICS_FILE = os.path.join(os.path.dirname(SCHEDULE_FILE), "metrics.json")
+METRICS_PROM_FILE = os.getenv("METRICS_PROM_FILE")
+
+HISTORY_FILE = os.getenv("HISTORY_FILE", "history.jsonl")
+HISTORY_INDEX_FILE = HISTORY_FILE + ".idx"
+LEGACY_HISTORY_FILE = "history.json"
+
+# Мінімальна ймовірність слота, щоб потрапити в прогноз
+FORECAST_THRESHOLD = float(os.getenv("FORECAST_THRESHOLD", "0.5"))
+
+# Прогноз бачить лише останні FORECAST_WEEKS тижнів історії — вартість запуску не росте з роками
+FORECAST_WEEKS = int(os.getenv("FORECAST_WEEKS", "12"))
+
+# Легкий профіль Chrome: eager-завантаження, без картинок, шрифтів, медіа і сторонніх скриптів (0 — повний профіль)
+BROWSER_LEAN = os.getenv("BROWSER_LEAN", "1") == "1"
+
+# Що блокуємо через DevTools (Network.setBlockedURLs). CSS лишаємо — від нього залежить видимість автодоповнення
+BLOCKED_URLS = [
+    "*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.svg", "*.ico",
+    "*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot",
+    "*.mp4", "*.webm", "*.mp3",
+    "*google-analytics.com*", "*googletagmanager.com*", "*doubleclick.net*",
+    "*facebook.net*", "*facebook.com/tr*", "*hotjar.com*", "*clarity.ms*",
+    "*youtube.com*", "*ytimg.com*", "*maps.googleapis.com*",
+]
+
+# Кількість паралельних браузерів для DTEK
+DTEK_WORKERS = int(os.getenv("DTEK_WORKERS", "3"))
+
+# Одна сторінка на воркер: місто і popup — раз, далі тільки вулиця/будинок
+DTEK_SESSION_REUSE = os.getenv("DTEK_SESSION_REUSE", "1") == "1"
+
+# Скільки додаткових заповнень форми за запуск можна витратити на повтор груп, що впали
+DTEK_RETRY_BUDGET = int(os.getenv("DTEK_RETRY_BUDGET", "2"))
+
+# Джерело DTEK: auto (HTTP, Selenium як fallback) | http | selenium
+DTEK_SOURCE = os.getenv("DTEK_SOURCE", "auto")
+
+# HTTP: повтори з відступом backoff * 2^n, таймаут (connect, read), breaker — збоїв поспіль і пауза
+HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", "2"))
+HTTP_BACKOFF = float(os.getenv("HTTP_BACKOFF", "0.5"))
+HTTP_TIMEOUT = (5, 15)
+HTTP_BREAKER_THRESHOLD = 3
+HTTP_BREAKER_COOLDOWN = 60
+
+# Остання добра відповідь YASNO; довше за YASNO_STALE_AFTER секунд свіжу не чекаємо, якщо є кеш
+YASNO_CACHE_FILE = os.path.join(CACHE_DIR, "yasno.json")
+YASNO_STALE_AFTER = float(os.getenv("YASNO_STALE_AFTER", "10"))
+
+# Тижневий шаблон YASNO: перерахунок кешується за хешем payload, week.json — на WEEK_HORIZON днів уперед
+YASNO_WEEK_FILE = os.path.join(CACHE_DIR, "yasno_week.json")
+WEEK_FILE = os.path.join(os.path.dirname(SCHEDULE_FILE), "week.json")
+WEEK_HORIZON = int(os.getenv("WEEK_HORIZON", "7"))
+
+HTTP_USER_AGENT = "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0 Safari/537.36"
+
+# Значення годин у DisconSchedule.fact -> (перша половина, друга половина) без світла
+FACT_SLOT_VALUES = {
+    "no": (True, True),
+    "first": (True, False),
+    "second": (False, True),
+}
+
+# Адреси за замовчуванням, якщо addresses.json немає
+DEFAULT_ADDRESSES = {
+    "1.1": ["пров. Парковий"],
+    "1.2": ["вул. Мохова"],
+    "3.1": ["вул. Центральна"],
+    "3.2": ["вул. Холодильна"],
+    "5.1": ["пров. Морський"],
+    "5.2": ["вул. Автодорожна"],
 }
 
+
+def load_address_config(path=ADDRESSES_FILE):
+    """addresses.json -> {група: [(місто, вулиця, будинок), ...]}
+    
+    Адреса — рядок з вулицею або {"street": ..., "city": ..., "house": ...}.
+    Місто за замовчуванням — "city" конфігу (або CITY), будинок — "1".
+    """
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            config = json.load(f)
+    except FileNotFoundError:
+        config = {"groups": DEFAULT_ADDRESSES}
+    
+    city = config.get("city", CITY)
+    groups = {}
+    for group, addresses in config.get("groups", {}).items():
+        groups[group] = []
+        for address in addresses:
+            if isinstance(address, str):
+                address = {"street": address}
+            groups[group].append((address.get("city", city), address["street"], str(address.get("house", "1"))))
+    return groups
+
+
+# DTEK групи (HTTP, Selenium як fallback) з адресами для перевірки/скрапінгу
+DTEK_GROUPS = load_address_config()
+
 # YASNO групи (парсимо через API)
 YASNO_GROUPS = ["2.1", "2.2", "4.1", "4.2", "6.1", "6.2"]
 
+ALL_GROUPS = list(DTEK_GROUPS) + YASNO_GROUPS
 
-def fetch_yasno_schedule():
-    """Отримує графіки з YASNO API для груп 2.x, 4.x, 6.x"""
-    result = {"today": {}, "tomorrow": {}}
+# --watch: межі адаптивного інтервалу опитування (секунди), множник відступу і джитер
+WATCH_MIN_INTERVAL = int(os.getenv("WATCH_MIN_INTERVAL", "30"))
+WATCH_MAX_INTERVAL = int(os.getenv("WATCH_MAX_INTERVAL", "300"))
+WATCH_BACKOFF = 1.5
+WATCH_JITTER = 0.2
+
+# Дедлайни джерел (секунди): повільне чи зависле джерело не затримує запис даних інших
+SOURCE_DEADLINES = {
+    "dtek": int(os.getenv("DTEK_DEADLINE", "600")),
+    "yasno": int(os.getenv("YASNO_DEADLINE", "60")),
+}
+
+# Бюджет усього запуску (секунди): що встигли до нього — публікується, решта береться з останніх добрих даних.
+# PUBLISH_RESERVE — запас під злиття і запис файлів, джерела мусять віддати дані раніше
+RUN_BUDGET = int(os.getenv("RUN_BUDGET", "480"))
+PUBLISH_RESERVE = int(os.getenv("PUBLISH_RESERVE", "30"))
+
+# Бюджет групи DTEK = час, що лишився, / групи, що лишились у воркера, але не більше MAX.
+# Менше MIN — групу вже не починаємо. DTEK_MARGIN — час воркеру прибрати за собою до дедлайну джерела
+GROUP_BUDGET_MAX = int(os.getenv("GROUP_BUDGET_MAX", "90"))
+GROUP_BUDGET_MIN = 15
+DTEK_MARGIN = 10
+
+# Ліміт driver.get(): без нього зависле завантаження сторінки блокує воркер назавжди
+PAGE_LOAD_TIMEOUT = int(os.getenv("PAGE_LOAD_TIMEOUT", "30"))
+
+
+def fetch_yasno_payload(cached):
+    """Запит до YASNO API; умовний, якщо в кеші є ETag/Last-Modified. Повертає запис для YASNO_CACHE"""
+    headers = {}
+    if cached and cached.get("etag"):
+        headers["If-None-Match"] = cached["etag"]
+    if cached and cached.get("last_modified"):
+        headers["If-Modified-Since"] = cached["last_modified"]
+    
+    with METRICS.span("step", step="api_fetch"):
+        r = http_session().get(YASNO_API, headers=headers)
+    
+    if r.status_code == 304 and cached:
+        print("   💤 YASNO: 304 Not Modified")
+        return dict(cached)
+    
+    r.raise_for_status()
+    return {"etag": r.headers.get("ETag"), "last_modified": r.headers.get("Last-Modified"), "body": r.json()}
+
+
+def fetch_yasno_schedule(state=None, clock=None, progress=None):
+    """Отримує графіки з YASNO API для груп 2.x, 4.x, 6.x
+    
+    Відповідь іде через YASNO_CACHE: якщо API лежить або не встиг за YASNO_STALE_AFTER секунд
+    (і до дедлайну запуску clock), беремо останню добру відповідь і позначаємо результат "stale".
+    progress не потрібен: усі групи приходять однією відповіддю.
+    state — стан попереднього запуску з хешем компонента графіків; якщо він той самий,
+    повертає {"unchanged": True}.
+    """
+    result = {"today": {}, "tomorrow": {}, "missing": list(YASNO_GROUPS)}
+    state = state if state is not None else {}
+    clock = clock or RunClock()
+    cached = state.get("yasno", {})
     
     try:
         print("\n📡 Завантаження YASNO API...")
-        r = requests.get(YASNO_API, timeout=30)
-        r.raise_for_status()
-        data = r.json()
+        wait = max(0, min(YASNO_STALE_AFTER, clock.remaining(PUBLISH_RESERVE)))
+        entry, stale = YASNO_CACHE.get(fetch_yasno_payload, wait)
+        if stale:
+            result["stale"] = datetime.fromtimestamp(entry["fetched"]).strftime("%Y-%m-%d %H:%M:%S")
         
         # Знаходимо компонент з графіками
-        components = data.get("components", [])
+        components = entry["body"].get("components", [])
         schedule_data = None
         
         for comp in components:
@@ -61,33 +267,38 @@ def fetch_yasno_schedule():
             print("   ⚠️ Графіки YASNO не знайдено")
             return result
         
-        # Визначаємо день тижня (0=пн, 6=нд)
-        today_weekday = datetime.now().weekday()
-        tomorrow_weekday = (today_weekday + 1) % 7
+        payload_hash = hashlib.sha256(json.dumps(schedule_data, sort_keys=True).encode("utf-8")).hexdigest()
         
-        for group in YASNO_GROUPS:
-            group_key = f"group_{group}"
-            group_data = schedule_data.get(group_key, [])
-            
-            if not group_data or len(group_data) < 7:
-                continue
-            
-            # Парсимо сьогодні
-            today_slots = group_data[today_weekday]
-            today_intervals = yasno_slots_to_intervals(today_slots)
-            if today_intervals:
-                result["today"][group] = today_intervals
+        if payload_hash == cached.get("hash"):
+            print("   💤 YASNO: графіки без змін")
+            # Джерело відповіло — нічого не бракує, групи беруться з попереднього графіка
+            result["unchanged"] = True
+            result["missing"] = []
+            return result
+        
+        # Увесь тиждень одним проходом (або з кешу), сьогодні і завтра — перші два дні горизонту
+        week = load_yasno_week(schedule_data, payload_hash)
+        horizon = week_horizon(week, datetime.now(), max(WEEK_HORIZON, 2))
+        today_groups, tomorrow_groups = list(horizon.values())[:2]
+        # week.json пише publish() разом з рештою файлів
+        result["week"] = {"horizon": horizon, "hash": payload_hash, "stale": result.get("stale")}
+        
+        missing = [g for g in YASNO_GROUPS if g not in week]
+        for group in week:
+            today_mask = today_groups.get(group, 0)
+            if today_mask:
+                result["today"][group] = today_mask
             
-            # Парсимо завтра
-            tomorrow_slots = group_data[tomorrow_weekday]
-            tomorrow_intervals = yasno_slots_to_intervals(tomorrow_slots)
-            if tomorrow_intervals:
-                result["tomorrow"][group] = tomorrow_intervals
+            tomorrow_mask = tomorrow_groups.get(group, 0)
+            if tomorrow_mask:
+                result["tomorrow"][group] = tomorrow_mask
             
-            total_today = sum_intervals(today_intervals)
-            total_tomorrow = sum_intervals(tomorrow_intervals)
+            total_today = mask_minutes(today_mask)
+            total_tomorrow = mask_minutes(tomorrow_mask)
             print(f"   📍 Група {group}: сьогодні {total_today//60}год {total_today%60:02d}хв, завтра {total_tomorrow//60}год {total_tomorrow%60:02d}хв")
         
+        result["missing"] = missing
+        state["yasno"] = {"hash": payload_hash}
         print(f"   ✅ YASNO: {len(result['today'])} груп")
         
     except Exception as e:
@@ -96,139 +307,659 @@ def fetch_yasno_schedule():
     return result
 
 
-def yasno_slots_to_intervals(slots):
-    """Конвертує слоти YASNO в інтервали"""
-    if not slots:
-        return []
+def yasno_week(schedule_data):
+    """Весь тижневий шаблон YASNO: {група: [маска пн, ..., маска нд]}. Групи без 7 днів пропускаються"""
+    week = {}
+    for group in YASNO_GROUPS:
+        days = schedule_data.get(f"group_{group}") or []
+        if len(days) >= 7:
+            week[group] = [yasno_slots_to_mask(slots) for slots in days[:7]]
+    return week
+
+
+def load_yasno_week(schedule_data, payload_hash):
+    """Тижнева модель з кешу, якщо payload той самий; інакше рахується і кешується (маски — hex)"""
+    try:
+        with open(YASNO_WEEK_FILE, "r", encoding="utf-8") as f:
+            cached = json.load(f)
+        if cached.get("hash") == payload_hash:
+            return {g: [int(m, 16) for m in masks] for g, masks in cached["groups"].items()}
+    except:
+        pass
     
-    intervals = []
-    for slot in slots:
-        start = slot.get("start", 0)
-        end = slot.get("end", 0)
-        slot_type = slot.get("type", "")
-        
+    week = yasno_week(schedule_data)
+    try:
+        os.makedirs(os.path.dirname(YASNO_WEEK_FILE) or ".", exist_ok=True)
+        groups = {g: [format(m, "x") for m in masks] for g, masks in week.items()}
+        write_json_atomic(YASNO_WEEK_FILE, {"hash": payload_hash, "groups": groups})
+    except Exception as e:
+        print(f"⚠️ YASNO week cache error: {e}")
+    return week
+
+
+def week_horizon(week, start, days=WEEK_HORIZON):
+    """Тижнева модель -> {"dd.mm.yyyy": {група: маска}} на days днів від start (шаблон повторюється щотижня)"""
+    horizon = {}
+    for i in range(days):
+        date = start + timedelta(days=i)
+        weekday = date.weekday()
+        horizon[date.strftime("%d.%m.%Y")] = {g: masks[weekday] for g, masks in week.items() if masks[weekday]}
+    return horizon
+
+
+def write_week_file(horizon, payload_hash, stale=None):
+    """week.json для клієнтів: графік YASNO на горизонт WEEK_HORIZON днів"""
+    days = list(horizon.items())[:WEEK_HORIZON]
+    output = {
+        "timezone": "Europe/Kyiv",
+        "updated": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "source": "yasno.com.ua",
+        "hash": payload_hash,
+        "days": {date: {"groups": {g: mask_to_intervals(m) for g, m in groups.items()}} for date, groups in days},
+    }
+    if stale:
+        output["stale"] = stale
+    try:
+        write_json_atomic(WEEK_FILE, output, indent=2)
+    except Exception as e:
+        print(f"⚠️ Week file error: {e}")
+
+
+# === Інтервали як бітові маски ===
+# Доба групи — ціле число на 1440 біт (біт i = хвилина i без світла).
+# Об'єднання/перетин/різниця — це |, &, & ~; рядки "HH:MM-HH:MM" з'являються лише при серіалізації.
+
+MINUTES_PER_DAY = 24 * 60
+FULL_DAY = (1 << MINUTES_PER_DAY) - 1
+
+
+def range_mask(start, end):
+    """Маска хвилин [start, end)"""
+    start = max(0, min(start, MINUTES_PER_DAY))
+    end = max(start, min(end, MINUTES_PER_DAY))
+    return ((1 << (end - start)) - 1) << start
+
+
+def slots_to_mask(slots, slot_minutes=30):
+    """Слоти (True = без світла) -> маска"""
+    mask = 0
+    slot_mask = (1 << slot_minutes) - 1
+    for i, off in enumerate(slots):
+        if off:
+            mask |= slot_mask << (i * slot_minutes)
+    return mask
+
+
+def parse_minute(value):
+    """'HH:MM' -> хвилина доби"""
+    h, m = value.split(":")
+    return int(h) * 60 + int(m)
+
+
+def format_minute(minute):
+    """Хвилина доби -> 'HH:MM' (1440 -> '24:00')"""
+    return f"{minute // 60:02d}:{minute % 60:02d}"
+
+
+def intervals_to_mask(intervals):
+    """['HH:MM-HH:MM', ...] -> маска. Потрібно лише для читання вже збережених файлів"""
+    mask = 0
+    for iv in intervals or []:
+        parts = iv.split("-")
+        if len(parts) == 2:
+            mask |= range_mask(parse_minute(parts[0]), parse_minute(parts[1]))
+    return mask
+
+
+def mask_runs(mask):
+    """Маска -> [(start, end), ...] суцільних відрізків у хвилинах, за зростанням"""
+    runs = []
+    while mask:
+        low = mask & -mask
+        start = low.bit_length() - 1
+        # Додавання молодшого біта "прокочує" перенос через увесь відрізок одиниць
+        end = ((mask + low) & ~mask).bit_length() - 1
+        runs.append((start, end))
+        mask &= ~((1 << end) - 1)
+    return runs
+
+
+def mask_to_intervals(mask):
+    """Маска -> ['HH:MM-HH:MM', ...]"""
+    return [f"{format_minute(start)}-{format_minute(end)}" for start, end in mask_runs(mask)]
+
+
+def mask_minutes(mask):
+    """Сумарна тривалість відключень у хвилинах"""
+    return bin(mask).count("1")
+
+
+def mask_state_at(mask, minute):
+    """True, якщо у хвилину minute світла немає"""
+    return bool(mask >> minute & 1)
+
+
+def mask_diff(a, b):
+    """Хвилини, які є в a, але немає в b"""
+    return a & ~b & FULL_DAY
+
+
+def yasno_slots_to_mask(slots):
+    """Конвертує слоти YASNO (години з дробовою частиною) в маску"""
+    mask = 0
+    for slot in slots or []:
         # Беремо тільки DEFINITE_OUTAGE або POSSIBLE_OUTAGE
-        if "OUTAGE" in slot_type:
-            # Конвертуємо години в формат HH:MM
-            sh = int(start)
-            sm = int((start - sh) * 60)
-            eh = int(end)
-            em = int((end - eh) * 60)
-            
-            if eh == 24:
-                eh = 24
-                em = 0
-            
-            intervals.append(f"{sh:02d}:{sm:02d}-{eh:02d}:{em:02d}")
-    
-    # Об'єднуємо суміжні інтервали
-    return merge_intervals(intervals)
+        if "OUTAGE" in slot.get("type", ""):
+            # round, а не int: 0.1666 год * 60 = 9.99 -> 10 хв, а не 9
+            mask |= range_mask(round(slot.get("start", 0) * 60), round(slot.get("end", 0) * 60))
+    return mask
+
+
+def yasno_slots_to_intervals(slots):
+    """Конвертує слоти YASNO в інтервали"""
+    return mask_to_intervals(yasno_slots_to_mask(slots))
 
 
 def merge_intervals(intervals):
-    """Об'єднує суміжні інтервали"""
-    if not intervals:
-        return []
-    
-    # Сортуємо по початку
-    sorted_ivs = sorted(intervals)
-    merged = [sorted_ivs[0]]
-    
-    for iv in sorted_ivs[1:]:
-        last_end = merged[-1].split("-")[1]
-        curr_start = iv.split("-")[0]
-        
-        if last_end == curr_start:
-            # Об'єднуємо
-            merged[-1] = merged[-1].split("-")[0] + "-" + iv.split("-")[1]
-        else:
-            merged.append(iv)
-    
-    return merged
+    """Об'єднує суміжні і перетинні інтервали"""
+    return mask_to_intervals(intervals_to_mask(intervals))
 
 
 def sum_intervals(intervals):
     """Сумує тривалість інтервалів в хвилинах"""
-    total = 0
-    for iv in intervals:
-        parts = iv.split("-")
-        if len(parts) == 2:
-            sh, sm = map(int, parts[0].split(":"))
-            eh, em = map(int, parts[1].split(":"))
-            start = sh * 60 + sm
-            end = eh * 60 + em if eh != 24 else 24 * 60
-            total += end - start
-    return total
+    return mask_minutes(intervals_to_mask(intervals))
+
+
+def slots_to_intervals(slots):
+    return mask_to_intervals(slots_to_mask(slots))
 
 
-def setup_driver():
+def setup_driver(lean=None, service=None):
+    """Headless Chrome. lean (за замовчуванням BROWSER_LEAN) — легкий профіль: менше трафіку, пам'яті і очікування
+    
+    service — chromedriver Service, створений заздалегідь: його процес можна вбити, поки запуск ще висить.
+    """
+    lean = BROWSER_LEAN if lean is None else lean
+    
     options = Options()
     options.add_argument("--headless")
     options.add_argument("--no-sandbox")
     options.add_argument("--disable-dev-shm-usage")
     options.add_argument("--disable-gpu")
-    options.add_argument("--window-size=1920,1080")
-    return webdriver.Chrome(options=options)
+    
+    if lean:
+        # driver.get() повертається на DOMContentLoaded, а не після останньої картинки
+        options.page_load_strategy = "eager"
+        options.add_argument("--window-size=1024,768")
+        options.add_argument("--blink-settings=imagesEnabled=false")
+        options.add_argument("--disable-extensions")
+        options.add_argument("--disable-background-networking")
+        options.add_argument("--disable-component-update")
+        options.add_argument("--disable-default-apps")
+        options.add_argument("--disable-sync")
+        options.add_argument("--mute-audio")
+        options.add_argument("--no-first-run")
+        options.add_argument("--renderer-process-limit=1")
+        options.add_argument("--js-flags=--max-old-space-size=256")
+        options.add_experimental_option("prefs", {"profile.managed_default_content_settings.images": 2})
+    else:
+        options.add_argument("--window-size=1920,1080")
+    
+    driver = webdriver.Chrome(options=options, service=service)
+    driver.set_page_load_timeout(PAGE_LOAD_TIMEOUT)
+    driver.set_script_timeout(WAIT_TIMEOUTS["page"])
+    
+    if lean:
+        try:
+            driver.execute_cdp_cmd("Network.enable", {})
+            driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": BLOCKED_URLS})
+        except Exception as e:
+            print(f"    ⚠️ CDP недоступний, ресурси не блокуються: {e}")
+    
+    return driver
 
 
-def slots_to_intervals(slots):
-    if not any(slots):
-        return []
-    intervals = []
-    i = 0
-    while i < 48:
-        if slots[i]:
-            start = i
-            while i < 48 and slots[i]:
-                i += 1
-            end = i
-            sh, sm = divmod(start * 30, 60)
-            eh, em = divmod(end * 30, 60)
-            intervals.append(f"{sh:02d}:{sm:02d}-{eh:02d}:{em:02d}")
-        else:
-            i += 1
-    return intervals
+def quit_driver(driver):
+    try:
+        driver.quit()
+    except:
+        pass
 
 
-def save_history(result):
-    """Зберігає історію графіків для прогнозування"""
-    history_file = "history.json"
+def process_tree(pid):
+    """pid і всі його нащадки через /proc (на інших ОС — лише сам pid)"""
+    children = {}
+    try:
+        for entry in os.listdir("/proc"):
+            if entry.isdigit():
+                try:
+                    with open(f"/proc/{entry}/stat") as f:
+                        ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+                    children.setdefault(ppid, []).append(int(entry))
+                except (OSError, ValueError, IndexError):
+                    pass
+    except OSError:
+        return [pid]
+    
+    tree, stack = [], [pid]
+    while stack:
+        pid = stack.pop()
+        tree.append(pid)
+        stack.extend(children.get(pid, []))
+    return tree
+
+
+def kill_driver(driver):
+    """Жорстко вбиває chromedriver і весь Chrome під ним — quit() на завислому браузері зависає сам
     
+    Заблокований виклик у воркері після цього падає з помилкою з'єднання.
+    """
+    kill_service(getattr(driver, "service", None))
+
+
+def kill_service(service):
+    """kill_driver для chromedriver Service — і тоді, коли драйвер ще не створено (запуск висить)"""
     try:
-        # Завантажуємо існуючу історію
+        root = service.process.pid
+    except AttributeError:
+        return
+    for pid in process_tree(root):
+        try:
+            os.kill(pid, getattr(signal, "SIGKILL", signal.SIGTERM))
+        except OSError:
+            pass
+
+
+class DriverPool:
+    """Теплі браузери між запусками: воркер бере драйвер і повертає його, а не закриває
+    
+    Новий браузер воркер запускає сам (setup_driver) — під watchdog, як і скрап групи.
+    В одноразовому режимі пул закривається в кінці main(), у --watch браузери живуть весь час.
+    """
+    
+    def __init__(self):
+        self.idle = []
+        self.lock = threading.Lock()
+    
+    def take(self):
+        """Теплий драйвер або None, якщо пул порожній"""
+        with self.lock:
+            if self.idle:
+                return self.idle.pop()
+        return None
+    
+    def release(self, driver):
+        with self.lock:
+            self.idle.append(driver)
+    
+    def close(self):
+        with self.lock:
+            drivers, self.idle = self.idle, []
+        for driver in drivers:
+            quit_driver(driver)
+
+
+DRIVERS = DriverPool()
+
+
+def http_session():
+    """Спільна HTTP-сесія: пул keep-alive, повтори, breaker (між запитами і між опитуваннями в --watch)"""
+    global HTTP_SESSION
+    with HTTP_SESSION_LOCK:
+        if HTTP_SESSION is None:
+            HTTP_SESSION = ResilientSession(
+                user_agent=HTTP_USER_AGENT,
+                retries=HTTP_RETRIES,
+                backoff=HTTP_BACKOFF,
+                timeout=HTTP_TIMEOUT,
+                breaker=CircuitBreaker(HTTP_BREAKER_THRESHOLD, HTTP_BREAKER_COOLDOWN),
+            )
+        return HTTP_SESSION
+
+
+HTTP_SESSION = None
+HTTP_SESSION_LOCK = threading.Lock()
+HISTORY_INDEX_CACHE = None
+RECORDER = FlightRecorder(DEBUG_DIR)
+# Потік останнього запуску кожного джерела: покинутий по дедлайну може ще працювати
+SOURCE_RUNNERS = {}
+WATCHDOG = Watchdog()
+YASNO_CACHE = StaleWhileRevalidate(YASNO_CACHE_FILE)
+
+
+# Таймаути очікування по кроках (секунди)
+WAIT_TIMEOUTS = {
+    "page": 20,
+    "popup": 3,
+    "input": 5,
+    "autocomplete": 5,
+    "table": 10,
+    "network": 10,
+}
+
+
+def wait_for(driver, condition, step, timeout=None):
+    """Чекає на умову готовності і логує, скільки реально чекали. Повертає результат умови або None по таймауту"""
+    timeout = timeout or WAIT_TIMEOUTS["page"]
+    start = time.perf_counter()
+    
+    with METRICS.span("step", step=step) as span:
         try:
-            with open(history_file, "r", encoding="utf-8") as f:
-                history = json.load(f)
-        except:
-            history = {"days": {}}
+            value = WebDriverWait(driver, timeout, poll_frequency=0.1).until(condition)
+            elapsed = time.perf_counter() - start
+            print(f"    ⏱ {step}: {elapsed:.2f}с")
+            RECORDER.record("wait", step=step, seconds=round(elapsed, 3))
+            return value
+        except TimeoutException:
+            print(f"    ⏱ {step}: таймаут {timeout}с")
+            RECORDER.record("wait", step=step, seconds=timeout, timeout=True)
+            span.tag(outcome="timeout")
+            METRICS.count("wait_timeouts")
+            return None
+
+
+def dom_ready(driver):
+    """DOM розібрано (скрипти сторінки виконані) і немає активних AJAX-запитів jQuery.
+    
+    Не чекає на readyState 'complete' — з eager-профілем це звело б його нанівець.
+    """
+    return driver.execute_script(
+        "return document.readyState !== 'loading' && (!window.jQuery || window.jQuery.active === 0);"
+    )
+
+
+def input_enabled(selector):
+    """Умова: поле існує і не disabled. Повертає сам елемент"""
+    def condition(driver):
+        elements = driver.find_elements(By.CSS_SELECTOR, selector)
+        if elements and elements[0].is_enabled():
+            return elements[0]
+        return False
+    return condition
+
+
+def table_ready(driver):
+    """Активна таблиця графіка заповнена клітинками"""
+    cells = driver.find_elements(By.CSS_SELECTOR, ".discon-fact-table.active table tbody td[class*='cell-']")
+    return len(cells) >= 24
+
+
+# === Історія: append-only JSONL ===
+# Кожен запуск з новими даними дописує один рядок {"date", "updated", "groups"} — останній запис дати перемагає.
+# Поруч лежить індекс "YYYY-MM-DD offset length" для читання діапазону дат без сканування всього файлу.
+
+
+def iso_date(date):
+    """'dd.mm.yyyy' -> 'yyyy-mm-dd' (сортується як рядок)"""
+    d, m, y = date.split(".")
+    return f"{y}-{m}-{d}"
+
+
+def read_history_index():
+    """Індекс історії {iso_date: [(offset, length), ...]} в порядку запису. Перебудовує його, якщо він застарів
+    
+    Прочитаний індекс тримається в пам'яті (HISTORY_INDEX_CACHE), поки розмір історії збігається:
+    повторні save_history і прогноз у --watch не перечитують .idx.
+    """
+    global HISTORY_INDEX_CACHE
+    try:
+        size = os.path.getsize(HISTORY_FILE)
+    except OSError:
+        return {}
+    
+    if HISTORY_INDEX_CACHE is not None and HISTORY_INDEX_CACHE[:2] == (HISTORY_FILE, size):
+        return HISTORY_INDEX_CACHE[2]
+    
+    index = {}
+    end = 0
+    try:
+        with open(HISTORY_INDEX_FILE, "r", encoding="utf-8") as f:
+            for line in f:
+                date, offset, length = line.split()
+                index.setdefault(date, []).append((int(offset), int(length)))
+                end = max(end, int(offset) + int(length))
+    except (OSError, ValueError):
+        end = -1
+    
+    if end != size:
+        index = rebuild_history_index()
+    HISTORY_INDEX_CACHE = (HISTORY_FILE, size, index)
+    return index
+
+
+def rebuild_history_index():
+    """Сканує JSONL і перезаписує індекс"""
+    global HISTORY_INDEX_CACHE
+    index = {}
+    lines = []
+    offset = 0
+    with open(HISTORY_FILE, "rb") as f:
+        for raw in f:
+            if raw.strip():
+                date = iso_date(json.loads(raw)["date"])
+                index.setdefault(date, []).append((offset, len(raw)))
+                lines.append(f"{date} {offset} {len(raw)}\n")
+            offset += len(raw)
+    
+    with open(HISTORY_INDEX_FILE, "w", encoding="utf-8") as f:
+        f.writelines(lines)
+    HISTORY_INDEX_CACHE = (HISTORY_FILE, offset, index)
+    return index
+
+
+def read_history_record(f, offset, length):
+    f.seek(offset)
+    return json.loads(f.read(length))
+
+
+def read_history(start=None, end=None):
+    """Останній запис кожної дати в діапазоні [start, end] (дати 'dd.mm.yyyy'). Повертає {date: record}"""
+    migrate_legacy_history()
+    index = read_history_index()
+    lo = iso_date(start) if start else ""
+    hi = iso_date(end) if end else "9999"
+    
+    records = {}
+    if not index:
+        return records
+    
+    with open(HISTORY_FILE, "rb") as f:
+        for date in sorted(d for d in index if lo <= d <= hi):
+            record = read_history_record(f, *index[date][-1])
+            records[record["date"]] = record
+    return records
+
+
+def append_history(record, index=None):
+    """O(1) дописування запису в кінець історії і індексу"""
+    global HISTORY_INDEX_CACHE
+    line = (json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+    
+    with open(HISTORY_FILE, "ab") as f:
+        offset = f.seek(0, os.SEEK_END)
+        f.write(line)
+    
+    with open(HISTORY_INDEX_FILE, "a", encoding="utf-8") as f:
+        f.write(f"{iso_date(record['date'])} {offset} {len(line)}\n")
+    
+    date = iso_date(record["date"])
+    if index is not None:
+        index.setdefault(date, []).append((offset, len(line)))
+    
+    # Кеш у пам'яті лишається дійсним, якщо до запису файл був саме таким, як у кеші
+    if HISTORY_INDEX_CACHE is not None and HISTORY_INDEX_CACHE[:2] == (HISTORY_FILE, offset):
+        cached = HISTORY_INDEX_CACHE[2]
+        if cached is not index:
+            cached.setdefault(date, []).append((offset, len(line)))
+        HISTORY_INDEX_CACHE = (HISTORY_FILE, offset + len(line), cached)
+
+
+def compact_history():
+    """Залишає по одному (останньому) запису на дату, відсортовано за датою"""
+    records = read_history()
+    tmp_file = HISTORY_FILE + ".tmp"
+    
+    with open(tmp_file, "w", encoding="utf-8") as f:
+        for record in sorted(records.values(), key=lambda r: iso_date(r["date"])):
+            f.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n")
+    
+    os.replace(tmp_file, HISTORY_FILE)
+    rebuild_history_index()
+    print(f"🗜️ Історію стиснуто: {len(records)} днів")
+
+
+def migrate_legacy_history():
+    """Одноразово переносить старий history.json ({"days": {...}}) у JSONL"""
+    if os.path.exists(HISTORY_FILE) or not os.path.exists(LEGACY_HISTORY_FILE):
+        return
+    
+    try:
+        with open(LEGACY_HISTORY_FILE, "r", encoding="utf-8") as f:
+            days = json.load(f).get("days", {})
+    except Exception as e:
+        print(f"⚠️ Legacy history error: {e}")
+        return
+    
+    for date in sorted(days, key=iso_date):
+        append_history({"date": date, "updated": days[date].get("updated"), "groups": days[date].get("groups", {})})
+    print(f"📚 Перенесено {len(days)} днів з {LEGACY_HISTORY_FILE}")
+
+
+def load_history(start=None, end=None):
+    """Історія як {"dd.mm.yyyy": {група: маска}}"""
+    try:
+        records = read_history(start, end)
+    except Exception as e:
+        print(f"⚠️ History error: {e}")
+        return {}
+    
+    return {
+        date: {g: intervals_to_mask(ivs) for g, ivs in record.get("groups", {}).items()}
+        for date, record in records.items()
+    }
+
+
+def add_forecast(result, history=None):
+    """Додає в результат блок forecast — ймовірні вікна відключень для груп без графіка на цей день
+    
+    Прогноз робиться по парах (день, група) з unpublished: група, опублікована без відключень,
+    прогнозу не отримує — її просто немає в groups.
+    """
+    if analytics is None:
+        print("⚠️ Прогноз пропущено: NumPy не встановлено")
+        return
+    
+    missing = {result[day]["date"]: result[day].get("unpublished", []) for day in ("today", "tomorrow")}
+    missing = {date: groups for date, groups in missing.items() if groups}
+    if not missing:
+        return
+    
+    try:
+        start = time.perf_counter()
+        if history is None:
+            today = datetime.strptime(result["today"]["date"], "%d.%m.%Y")
+            history = load_history(start=(today - timedelta(weeks=FORECAST_WEEKS)).strftime("%d.%m.%Y"))
+        predicted = analytics.forecast(history, ALL_GROUPS, list(missing), FORECAST_THRESHOLD)
+        
+        days = {
+            date: {g: slots_to_intervals(slots) for g, slots in groups_slots.items() if g in missing[date]}
+            for date, groups_slots in predicted.items()
+        }
+        days = {date: groups for date, groups in days.items() if groups}
+        
+        if days:
+            result["forecast"] = {
+                "based_on_days": len(history),
+                "threshold": FORECAST_THRESHOLD,
+                "days": days,
+            }
+        
+        print(f"🔮 Прогноз на {', '.join(missing)}: {(time.perf_counter() - start) * 1000:.1f}мс")
+    
+    except Exception as e:
+        print(f"⚠️ Forecast error: {e}")
+
+
+def save_history(result):
+    """Дописує сьогоднішні графіки в історію для прогнозування (лише якщо вони змінились)"""
+    try:
+        migrate_legacy_history()
         
-        # Додаємо сьогоднішні дані
         today_date = result["today"]["date"]
         today_groups = result["today"]["groups"]
         
-        if today_date and today_groups:
-            # Зберігаємо тільки якщо є дані
-            history["days"][today_date] = {
-                "groups": today_groups,
-                "updated": result["updated"]
-            }
+        # Зберігаємо тільки якщо є дані
+        if not today_date or not today_groups:
+            return
+        
+        index = read_history_index()
+        entries = index.get(iso_date(today_date))
         
-        # Видаляємо старі записи (більше 30 днів)
-        if len(history["days"]) > 30:
-            sorted_dates = sorted(history["days"].keys())
-            for old_date in sorted_dates[:-30]:
-                del history["days"][old_date]
+        if entries:
+            with open(HISTORY_FILE, "rb") as f:
+                if read_history_record(f, *entries[-1]).get("groups") == today_groups:
+                    return
         
-        # Зберігаємо
-        with open(history_file, "w", encoding="utf-8") as f:
-            json.dump(history, f, ensure_ascii=False, indent=2)
+        append_history({"date": today_date, "updated": result["updated"], "groups": today_groups}, index)
         
-        print(f"📚 Історія: {len(history['days'])} днів")
+        # Стискаємо, коли перезаписаних записів стало більше, ніж живих днів
+        total = sum(len(e) for e in index.values())
+        if total > 2 * len(index):
+            compact_history()
+        
+        print(f"📚 Історія: {len(index)} днів")
         
     except Exception as e:
         print(f"⚠️ History error: {e}")
 
 
+def summarize_popup(full_text):
+    """Стискає текст popup до короткого повідомлення. Повертає (message, is_emergency)"""
+    full_text = full_text.strip()
+    
+    # Беремо тільки перший абзац або перші 2-3 речення
+    lines = [l.strip() for l in full_text.split('\n') if l.strip()]
+    
+    # Пропускаємо заголовок типу "Шановні клієнти!"
+    start_idx = 0
+    skip_phrases = ["шановні", "увага", "dear", "дорогі"]
+    if lines and any(p in lines[0].lower() for p in skip_phrases):
+        start_idx = 1
+    
+    # Беремо наступні 1-2 рядки (зазвичай це основна інформація)
+    important_lines = lines[start_idx:start_idx + 2]
+    message = " ".join(important_lines)
+    
+    # Обрізаємо якщо занадто довге (макс 200 символів)
+    if len(message) > 200:
+        # Знаходимо кінець речення
+        for end in ['. ', '! ', '? ']:
+            idx = message[:200].rfind(end)
+            if idx > 50:
+                message = message[:idx + 1]
+                break
+        else:
+            message = message[:197] + "..."
+    
+    # Перевіряємо на екстрені відключення
+    emergency_keywords = [
+        "екстрен",
+        "аварій",
+        "терміново",
+        "негайно",
+        "надзвичайн",
+        "без графік",
+        "цілодобов",
+        "00:00 до 24:00",
+        "весь день",
+    ]
+    
+    message_lower = full_text.lower()
+    is_emergency = any(keyword in message_lower for keyword in emergency_keywords)
+    
+    return message or None, is_emergency
+
+
 def close_popup(driver):
     """Закриває popup і повертає текст повідомлення"""
     message = None
@@ -238,346 +969,1455 @@ def close_popup(driver):
         # Читаємо текст popup
         popup = driver.find_element(By.CSS_SELECTOR, ".modal__container, .m-attention__container, [class*='modal'][class*='container']")
         if popup:
-            full_text = popup.text.strip()
-            
-            # Беремо тільки перший абзац або перші 2-3 речення
-            lines = [l.strip() for l in full_text.split('\n') if l.strip()]
-            
-            # Пропускаємо заголовок типу "Шановні клієнти!"
-            start_idx = 0
-            skip_phrases = ["шановні", "увага", "dear", "дорогі"]
-            if lines and any(p in lines[0].lower() for p in skip_phrases):
-                start_idx = 1
-            
-            # Беремо наступні 1-2 рядки (зазвичай це основна інформація)
-            important_lines = lines[start_idx:start_idx + 2]
-            message = " ".join(important_lines)
-            
-            # Обрізаємо якщо занадто довге (макс 200 символів)
-            if len(message) > 200:
-                # Знаходимо кінець речення
-                for end in ['. ', '! ', '? ']:
-                    idx = message[:200].rfind(end)
-                    if idx > 50:
-                        message = message[:idx + 1]
-                        break
-                else:
-                    message = message[:197] + "..."
-            
-            # Перевіряємо на екстрені відключення
-            emergency_keywords = [
-                "екстрен",
-                "аварій",
-                "терміново",
-                "негайно",
-                "надзвичайн",
-                "без графік",
-                "цілодобов",
-                "00:00 до 24:00",
-                "весь день",
-            ]
-            
-            message_lower = full_text.lower()
-            for keyword in emergency_keywords:
-                if keyword in message_lower:
-                    is_emergency = True
-                    break
+            message, is_emergency = summarize_popup(popup.text)
         
         # Закриваємо popup
         close_btn = driver.find_element(By.CSS_SELECTOR, ".modal__close, .m-attention__close")
         if close_btn:
             close_btn.click()
-        time.sleep(1)
+            wait_for(driver, EC.invisibility_of_element(popup), "popup: закрито", WAIT_TIMEOUTS["popup"])
         
-    except:
-        pass
+    except Exception as e:
+        # Popup буває не завжди — це не збій, але слід лишаємо
+        RECORDER.record("popup", error=repr(e))
     
     return message, is_emergency
 
 
-def fill_form(driver, street):
-    """Заповнює форму через ActionChains. Повертає (success, popup_message, is_emergency)"""
-    actions = ActionChains(driver)
-    popup_message = None
-    is_emergency = False
+def fill_autocomplete(driver, field, value):
+    """Вводить значення в поле форми і обирає перший варіант автодоповнення"""
+    selector = f".discon-schedule-form #{field}"
     
-    try:
-        # Чекаємо форму
-        WebDriverWait(driver, 10).until(
-            EC.presence_of_element_located((By.CSS_SELECTOR, ".discon-schedule-form #city"))
-        )
-        
-        # Закриваємо popup і читаємо повідомлення
-        popup_message, is_emergency = close_popup(driver)
-        time.sleep(2)
-        
-        # === МІСТО ===
-        city_input = driver.find_element(By.CSS_SELECTOR, ".discon-schedule-form #city")
-        
-        # Скролимо до елемента
-        driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", city_input)
-        time.sleep(0.5)
-        
-        # Клікаємо через JavaScript
-        driver.execute_script("arguments[0].click(); arguments[0].focus();", city_input)
-        time.sleep(0.5)
-        
-        # Вводимо текст через ActionChains
-        actions.move_to_element(city_input).click().send_keys(CITY).perform()
-        time.sleep(2)
-        
-        city_value = city_input.get_attribute("value")
+    # Чекаємо поки поле стане активним (його вмикає JS після попереднього кроку)
+    field_input = wait_for(driver, input_enabled(selector), f"{field}: поле активне", WAIT_TIMEOUTS["input"])
+    if field_input is None:
+        RECORDER.record("input_forced", selector=selector)
+        field_input = driver.find_element(By.CSS_SELECTOR, selector)
+        driver.execute_script("arguments[0].disabled = false;", field_input)
+    
+    driver.execute_script("arguments[0].scrollIntoView({block: 'center'}); arguments[0].click(); arguments[0].focus();", field_input)
+    ActionChains(driver).move_to_element(field_input).click().send_keys(value).perform()
+    
+    # Клікаємо на перший елемент автодоповнення, щойно список відрендериться
+    autocomplete = wait_for(
+        driver,
+        EC.element_to_be_clickable((By.CSS_SELECTOR, f"#{field}autocomplete-list div, [class*='autocomplete'] div")),
+        f"{field}: автодоповнення",
+        WAIT_TIMEOUTS["autocomplete"],
+    )
+    RECORDER.record("autocomplete", field=field, value=value, fallback=autocomplete is None)
+    if autocomplete is not None:
+        autocomplete.click()
+    else:
+        METRICS.count("autocomplete_fallbacks")
+        field_input.send_keys(Keys.RETURN)
+    
+    return field_input
+
+
+def load_dtek_page(driver):
+    """Завантажує сторінку DTEK і чекає, поки вона заспокоїться"""
+    driver.get(DTEK_URL)
+    wait_for(driver, dom_ready, "сторінка", WAIT_TIMEOUTS["page"])
+
+
+def select_city(driver, city=CITY):
+    """Чекає форму, закриває popup і обирає місто. Повертає (popup_message, is_emergency)"""
+    if wait_for(driver, EC.presence_of_element_located((By.CSS_SELECTOR, ".discon-schedule-form #city")), "форма", WAIT_TIMEOUTS["page"]) is None:
+        raise TimeoutException("форма не з'явилась")
+    
+    # Закриваємо popup і читаємо повідомлення
+    popup_message, is_emergency = close_popup(driver)
+    
+    # === МІСТО ===
+    fill_autocomplete(driver, "city", city)
+    
+    return popup_message, is_emergency
+
+
+def clear_address(driver):
+    """Очищає вулицю і будинок на вже відкритій сторінці, щоб ввести нову адресу без перезавантаження
+    
+    Таблиці попередньої групи прибираються з DOM: інакше table_ready спрацює одразу і,
+    якщо AJAX нової адреси ще не стартував, розпарситься чужий графік. Якщо сайт не перемалює
+    таблиці заново, fill_address не дочекається їх і scrape_dtek_group перезавантажить сторінку.
+    """
+    driver.execute_script("""
+        ['#street', '#house_num'].forEach(function (id) {
+            var input = document.querySelector('.discon-schedule-form ' + id);
+            if (!input) return;
+            input.value = '';
+            input.dispatchEvent(new Event('input', {bubbles: true}));
+            input.dispatchEvent(new Event('change', {bubbles: true}));
+        });
+        document.querySelectorAll('.discon-fact-table').forEach(function (table) {
+            table.remove();
+        });
+    """)
+
+
+def fill_address(driver, street, house="1"):
+    """Вводить вулицю і будинок (місто вже обране). Повертає True, якщо таблиця з'явилась"""
+    # === ВУЛИЦЯ ===
+    fill_autocomplete(driver, "street", street)
+    
+    # === БУДИНОК ===
+    try:
+        fill_autocomplete(driver, "house_num", house)
+    except Exception as e:
+        RECORDER.record("house", house=house, error=repr(e))
+    
+    # Чекаємо завершення AJAX і заповнену таблицю
+    wait_for(driver, dom_ready, "мережа", WAIT_TIMEOUTS["network"])
+    return wait_for(driver, table_ready, "таблиця", WAIT_TIMEOUTS["table"]) is not None
+
+
+def fill_form(driver, address):
+    """Заповнює форму через ActionChains. Повертає (success, popup_message, is_emergency)
+    
+    success — таблиця з'явилась: заповнена форма без таблиці — це збій, а не "відключень немає".
+    """
+    city, street, house = address
+    popup_message = None
+    is_emergency = False
+    
+    try:
+        popup_message, is_emergency = select_city(driver, city)
+        return fill_address(driver, street, house), popup_message, is_emergency
         
-        # Клікаємо на перший елемент автодоповнення
+    except Exception as e:
+        print(f"    ❌ Form error: {e}")
+        return False, popup_message, is_emergency
+
+
+def cell_classes_to_slots(classes):
+    """Конвертує класи 24 клітинок таблиці DTEK в 48 півгодинних слотів"""
+    slots = [False] * 48
+    
+    for i, cls in enumerate(classes[:24]):
+        first = "cell-scheduled" in cls and "maybe" not in cls
+        second = first
+        if "cell-first-half" in cls:
+            first, second = True, False
+        if "cell-second-half" in cls:
+            first, second = False, True
+        slots[i * 2] = first
+        slots[i * 2 + 1] = second
+    
+    return slots
+
+
+# Класи клітинок усіх таблиць (.discon-fact-table) за один виклик: [[class, ...], ...]
+SCHEDULE_CELLS_JS = """
+return Array.from(document.querySelectorAll('.discon-fact-table')).map(function (table) {
+    return Array.from(table.querySelectorAll('table tbody td[class*="cell-"]')).map(function (td) {
+        return td.className;
+    });
+});
+"""
+
+
+def parse_schedule(driver):
+    """Парсить обидві таблиці (сьогодні і завтра) одним execute_script. Повертає (slots_today, slots_tomorrow)
+    
+    Без жодної таблиці — (None, None): група лишається у failed і береться з останніх добрих даних.
+    Немає лише таблиці на завтра — графік на завтра ще не опубліковано: slots_tomorrow = None.
+    """
+    tables = []
+    
+    with METRICS.span("step", step="parse"):
         try:
-            autocomplete = WebDriverWait(driver, 3).until(
-                EC.presence_of_element_located((By.CSS_SELECTOR, "#cityautocomplete-list div, [class*='autocomplete'] div"))
-            )
-            autocomplete.click()
-        except:
-            city_input.send_keys(Keys.RETURN)
-        time.sleep(2)
-        
-        # === ВУЛИЦЯ ===
-        street_input = driver.find_element(By.CSS_SELECTOR, ".discon-schedule-form #street")
-        
-        # Перевіряємо чи активна
-        if street_input.get_attribute("disabled"):
-            driver.execute_script("arguments[0].disabled = false;", street_input)
+            tables = driver.execute_script(SCHEDULE_CELLS_JS) or []
+        except Exception as e:
+            RECORDER.record("parse", error=repr(e))
+    
+    # Знімок класів дешевий і пояснює більшість "дивних" графіків
+    RECORDER.record("cells", tables=[len(t) for t in tables], classes=sorted({c for t in tables for c in t})[:20])
+    
+    if not tables or not tables[0]:
+        METRICS.count("empty_tables")
+        RECORDER.dump("empty_table", driver)
+        return None, None
+    
+    slots_today = cell_classes_to_slots(tables[0])
+    slots_tomorrow = cell_classes_to_slots(tables[1]) if len(tables) > 1 else None
+    
+    return slots_today, slots_tomorrow
+
+
+class PopupTextParser(HTMLParser):
+    """Збирає текст першого popup-контейнера зі статичного HTML"""
+    
+    CONTAINER_CLASSES = ("modal__container", "m-attention__container")
+    
+    def __init__(self):
+        super().__init__()
+        self.depth = 0
+        self.done = False
+        self.parts = []
+    
+    def handle_starttag(self, tag, attrs):
+        if self.done:
+            return
+        if self.depth:
+            self.depth += 1
+            if tag in ("p", "br", "div", "li"):
+                self.parts.append("\n")
+            return
+        classes = (dict(attrs).get("class") or "").split()
+        if any(c in classes for c in self.CONTAINER_CLASSES):
+            self.depth = 1
+    
+    def handle_endtag(self, tag):
+        if self.depth:
+            self.depth -= 1
+            if not self.depth:
+                self.done = True
+    
+    def handle_data(self, data):
+        if self.depth and not self.done:
+            self.parts.append(data)
+    
+    @property
+    def text(self):
+        return "\n".join(" ".join(line.split()) for line in "".join(self.parts).split("\n"))
+
+
+def extract_js_object(html, name):
+    """Дістає JSON-об'єкт, присвоєний у скрипті сторінки (напр. DisconSchedule.fact = {...})"""
+    match = re.search(re.escape(name) + r"\s*=\s*\{", html)
+    if not match:
+        return None
+    try:
+        obj, _ = json.JSONDecoder().raw_decode(html, match.end() - 1)
+        return obj
+    except ValueError:
+        return None
+
+
+def parse_dtek_page(html):
+    """Розбирає статичну сторінку DTEK. Повертає (fact, csrf_token, popup_text)"""
+    fact = extract_js_object(html, "DisconSchedule.fact")
+    
+    csrf = re.search(r'<meta\s+name="csrf-token"\s+content="([^"]+)"', html)
+    
+    popup = PopupTextParser()
+    popup.feed(html)
+    
+    return fact, csrf.group(1) if csrf else None, popup.text.strip() or None
+
+
+def fact_days(fact):
+    """Повертає ключі fact.data для сьогодні і завтра (unix timestamp початку доби)"""
+    days = sorted(fact.get("data", {}), key=int)
+    today_key = str(fact.get("today") or (days[0] if days else ""))
+    later = [d for d in days if int(d) > int(today_key or 0)]
+    return today_key, later[0] if later else None
+
+
+def fact_hours_to_slots(hours):
+    """Конвертує погодинні значення fact (yes/no/first/second/maybe...) в 48 слотів — як parse_schedule()"""
+    slots = [False] * 48
+    for hour in range(24):
+        first, second = FACT_SLOT_VALUES.get(hours.get(str(hour + 1)), (False, False))
+        slots[hour * 2] = first
+        slots[hour * 2 + 1] = second
+    return slots
+
+
+def resolve_street_queue(session, csrf, address, fact_update=None):
+    """Питає AJAX-ендпоінт форми, до якої черги належить адреса (місто, вулиця, будинок). Повертає 'GPVx.y' або None
+    
+    Будинку немає у відповіді — None: черга сусіднього будинку могла б "підтвердити" чужу групу.
+    """
+    city, street, house = address
+    form = {
+        "method": "getHomeNum",
+        "data[0][name]": "city",
+        "data[0][value]": city,
+        "data[1][name]": "street",
+        "data[1][value]": street,
+    }
+    if fact_update:
+        form["data[2][name]"] = "updateFact"
+        form["data[2][value]"] = fact_update
+    
+    headers = {"X-Requested-With": "XMLHttpRequest", "Referer": DTEK_URL}
+    if csrf:
+        headers["X-CSRF-Token"] = csrf
+    
+    r = session.post(DTEK_AJAX_URL, data=form, headers=headers, timeout=15)
+    r.raise_for_status()
+    houses = r.json().get("data") or {}
+    
+    info = houses.get(house)
+    if not info:
+        return None
+    reasons = info.get("sub_type_reason") or []
+    return reasons[0] if reasons else None
+
+
+def address_label(address):
+    city, street, house = address
+    return street if city == CITY and house == "1" else f"{city}, {street}, {house}"
+
+
+def load_address_cache():
+    try:
+        with open(ADDRESS_CACHE_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except:
+        return {}
+
+
+def save_address_cache(cache):
+    try:
+        os.makedirs(os.path.dirname(ADDRESS_CACHE_FILE) or ".", exist_ok=True)
+        with open(ADDRESS_CACHE_FILE, "w", encoding="utf-8") as f:
+            json.dump(cache, f, ensure_ascii=False, indent=2)
+    except Exception as e:
+        print(f"⚠️ Address cache error: {e}")
+
+
+def resolve_addresses(session, page, cache, now=None):
+    """Розв'язує черги адрес, яких немає в кеші або в яких сплив TTL. Повертає кількість AJAX-запитів
+    
+    Якщо AJAX не відповів, старий запис лишається — краще застаріла черга, ніж жодної.
+    """
+    if page is None:
+        return 0
+    fact, csrf, _ = page
+    fact_update = (fact or {}).get("update")
+    now = now or time.time()
+    
+    resolved = 0
+    for group, addresses in DTEK_GROUPS.items():
+        for address in addresses:
+            key = "|".join(address)
+            entry = cache.get(key)
+            if entry and now - entry.get("resolved", 0) < ADDRESS_CACHE_TTL:
+                continue
+            
+            with METRICS.span("resolve", group=group) as span:
+                try:
+                    gpv = resolve_street_queue(session, csrf, address, fact_update)
+                except Exception as e:
+                    print(f"   ⚠️ {group}: AJAX недоступний для {address_label(address)} ({e})")
+                    span.tag(outcome="fallback")
+                    METRICS.count("ajax_fallbacks")
+                    continue
+            
+            resolved += 1
+            cache[key] = {"queue": gpv, "resolved": now}
+    
+    METRICS.count("address_resolutions", resolved)
+    return resolved
+
+
+def cached_queue(cache, address):
+    return (cache.get("|".join(address)) or {}).get("queue")
+
+
+def group_address(group, cache):
+    """Адреса, якою скрапити групу: перша, що точно належить черзі групи, інакше перша нерозв'язана
+    
+    Адреси з іншої черги пропускаються — їх таблиця дублювала б сусідню групу.
+    Повертає (адреса, черга) або (None, None), якщо підходящої адреси немає.
+    """
+    expected = f"GPV{group}"
+    unresolved = None
+    for address in DTEK_GROUPS.get(group, []):
+        gpv = cached_queue(cache, address)
+        if gpv == expected:
+            return address, gpv
+        if gpv is None and unresolved is None:
+            unresolved = address
+    return unresolved, None
+
+
+def report_address_mismatches(cache):
+    """Друкує адреси з конфігу, які насправді належать іншій черзі"""
+    for group, addresses in DTEK_GROUPS.items():
+        for address in addresses:
+            gpv = cached_queue(cache, address)
+            if gpv and gpv != f"GPV{group}":
+                METRICS.count("address_mismatches")
+                print(f"   ⚠️ {group}: {address_label(address)} належить до {gpv}")
+
+
+def fetch_dtek_page(session):
+    """Завантажує сторінку DTEK без браузера. Повертає (fact, csrf_token, popup_text) або None"""
+    with METRICS.span("step", step="page_fetch") as span:
+        try:
+            print("\n📡 Завантаження сторінки DTEK (без браузера)...")
+            r = session.get(DTEK_URL, timeout=30)
+            r.raise_for_status()
+            return parse_dtek_page(r.text)
+        except Exception as e:
+            print(f"   ❌ DTEK HTTP error: {e}")
+            span.tag(outcome="error", error=str(e))
+            return None
+
+
+def dtek_fingerprint(fact, popup_text):
+    """Дешевий відбиток DTEK: графіки з fact.data + текст popup. None, якщо графіків на сторінці немає"""
+    if not fact or not fact.get("data"):
+        return None
+    # Групи з конфігу теж входять у відбиток — інакше нова група чекала б зміни на сайті
+    payload = json.dumps({"data": fact["data"], "popup": popup_text, "groups": list(DTEK_GROUPS)}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def fetch_dtek_schedule_http(session, page, cache=None):
+    """Браузер-фрі джерело DTEK: графіки черг прямо з DisconSchedule.fact. Групи без даних — в 'missing'
+    
+    Адреси з конфігу тут потрібні лише для перевірки (cache — кеш адреса -> черга):
+    дані групи завжди беруться з її власної черги, скільки б адрес у неї не було.
+    """
+    result = {
+        "today": {}, "tomorrow": {}, "announcement": None, "emergency": False,
+        "missing": list(DTEK_GROUPS), "unpublished": {"tomorrow": []},
+    }
+    
+    if page is None:
+        return result
+    
+    try:
+        fact, csrf, popup_text = page
         
-        driver.execute_script("arguments[0].click(); arguments[0].focus();", street_input)
-        time.sleep(0.5)
+        if popup_text:
+            result["announcement"], result["emergency"] = summarize_popup(popup_text)
         
-        actions = ActionChains(driver)
-        actions.move_to_element(street_input).click().send_keys(street).perform()
-        time.sleep(2)
+        if not fact or not fact.get("data"):
+            print("   ⚠️ DisconSchedule.fact не знайдено (захист від ботів?)")
+            return result
         
-        street_value = street_input.get_attribute("value")
+        today_key, tomorrow_key = fact_days(fact)
+        print(f"   🕐 Оновлено на сайті: {fact.get('update')}")
         
-        # Клікаємо на автодоповнення
-        try:
-            autocomplete = WebDriverWait(driver, 3).until(
-                EC.presence_of_element_located((By.CSS_SELECTOR, "#streetautocomplete-list div, [class*='autocomplete'] div"))
-            )
-            autocomplete.click()
-        except:
-            street_input.send_keys(Keys.RETURN)
-        time.sleep(2)
+        if cache is None:
+            cache = {}
+            resolve_addresses(session, page, cache)
+        report_address_mismatches(cache)
         
-        # === БУДИНОК ===
-        try:
-            house_input = driver.find_element(By.CSS_SELECTOR, ".discon-schedule-form #house_num")
-            
-            if house_input.get_attribute("disabled"):
-                driver.execute_script("arguments[0].disabled = false;", house_input)
+        missing = []
+        for group in DTEK_GROUPS:
+            # Групи названі за чергами
+            gpv = f"GPV{group}"
+            today_hours = fact["data"].get(today_key, {}).get(gpv)
+            if today_hours is None:
+                missing.append(group)
+                continue
             
-            driver.execute_script("arguments[0].click(); arguments[0].focus();", house_input)
-            time.sleep(0.5)
+            tomorrow_hours = fact["data"].get(tomorrow_key, {}).get(gpv) if tomorrow_key else None
             
-            actions = ActionChains(driver)
-            actions.move_to_element(house_input).click().send_keys("1").perform()
-            time.sleep(1.5)
+            today_mask = slots_to_mask(fact_hours_to_slots(today_hours))
+            if today_mask:
+                result["today"][group] = today_mask
             
-            house_value = house_input.get_attribute("value")
+            # Черги на завтра ще немає у fact — графік не опубліковано, а не "відключень немає"
+            if tomorrow_hours is None:
+                result["unpublished"]["tomorrow"].append(group)
+            tomorrow_mask = slots_to_mask(fact_hours_to_slots(tomorrow_hours or {}))
+            if tomorrow_mask:
+                result["tomorrow"][group] = tomorrow_mask
             
-            # Клікаємо на автодоповнення
-            try:
-                autocomplete = WebDriverWait(driver, 3).until(
-                    EC.presence_of_element_located((By.CSS_SELECTOR, "#house_numautocomplete-list div, [class*='autocomplete'] div"))
-                )
-                autocomplete.click()
-            except:
-                house_input.send_keys(Keys.RETURN)
-        except Exception as e:
-            pass
+            total_today = mask_minutes(today_mask)
+            total_tomorrow = mask_minutes(tomorrow_mask)
+            tomorrow_label = "не опубліковано" if tomorrow_hours is None else f"{total_tomorrow//60}год {total_tomorrow%60:02d}хв"
+            print(f"   📍 Група {group}: сьогодні {total_today//60}год {total_today%60:02d}хв, завтра {tomorrow_label}")
         
-        time.sleep(3)
-        return True, popup_message, is_emergency
+        result["missing"] = missing
+        print(f"   ✅ DTEK (HTTP): {len(DTEK_GROUPS) - len(missing)} груп")
         
     except Exception as e:
-        print(f"    ❌ Form error: {e}")
-        return False, popup_message, is_emergency
+        print(f"   ❌ DTEK HTTP error: {e}")
+    
+    return result
 
 
-def parse_schedule(driver, day="today"):
-    """Парсить таблицю з графіком. day = 'today' або 'tomorrow'"""
-    slots = [False] * 48
+def scrape_dtek_group(driver, group, address, reuse_page=False):
+    """Парсить одну групу DTEK за адресою. Повертає (slots_today, slots_tomorrow, popup_message, is_emergency)
+    
+    reuse_page=True — сторінка вже відкрита і місто адреси обране: міняємо лише вулицю і будинок.
+    Якщо так не вийшло, сторінка перезавантажується повністю.
+    """
+    msg, emergency = None, False
+    success = False
+    
+    if reuse_page:
+        try:
+            clear_address(driver)
+            success = fill_address(driver, address[1], address[2])
+        except Exception as e:
+            print(f"    ⚠️ {group}: {e}")
+        
+        if not success:
+            METRICS.count("retries")
+            print(f"    🔄 {group}: перезавантажуємо сторінку")
+    
+    if not success:
+        load_dtek_page(driver)
+        success, msg, emergency = fill_form(driver, address)
+    
+    if not success:
+        print(f"    ⚠️ {group}: Form failed")
+        RECORDER.dump("form_failed", driver)
+        return None, None, msg, emergency
+    
+    slots_today, slots_tomorrow = parse_schedule(driver)
+    
+    return slots_today, slots_tomorrow, msg, emergency
+
+
+def group_budget(groups_left, clock):
+    """Секунди на наступну групу: час до дедлайну DTEK (clock — RunClock запуску) порівну між групами,
+    що лишились у воркера
+    
+    Рахується перед кожною групою, тож те, що швидка група не витратила, дістається наступним.
+    """
+    remaining = clock.remaining(PUBLISH_RESERVE + DTEK_MARGIN)
+    return min(GROUP_BUDGET_MAX, remaining / max(1, groups_left))
+
+
+def dtek_worker(shard, parent=None, clock=None, progress=None):
+    """Обробляє частину груп DTEK в окремому браузері. Ніколи не кидає виняток — повертає те, що встигла
+    
+    Кожна група (разом із запуском браузера) — під watchdog зі своїм бюджетом (group_budget):
+    завислий браузер вбивається, а наступна група стартує з новим. Коли часу на групу вже немає,
+    решта лишається у failed. Кожна готова група одразу йде в progress (SourceProgress).
+    """
+    result = {
+        "today": {}, "tomorrow": {}, "announcement": None, "emergency": False,
+        "failed": [g for g, _ in shard], "unpublished": {"tomorrow": []},
+    }
+    clock = clock or RunClock()
+    driver = None
+    page_city = None
+    
+    def kill(service, group):
+        print(f"    🐕 {group}: не вклалась у бюджет — вбиваємо браузер")
+        METRICS.count("watchdog_kills")
+        RECORDER.record("watchdog", group=group)
+        kill_service(service)
     
     try:
-        # Якщо потрібен завтрашній день - клікаємо на другу таблицю
-        if day == "tomorrow":
-            try:
-                # Знаходимо всі таби графіків
-                tabs = driver.find_elements(By.CSS_SELECTOR, ".discon-fact-table")
-                if len(tabs) >= 2:
-                    # Спробуємо кілька методів кліку
-                    tab = tabs[1]
-                    
-                    # Метод 1: Клік на thead (заголовок таблиці)
-                    try:
-                        thead = tab.find_element(By.TAG_NAME, "thead")
-                        thead.click()
-                        time.sleep(1)
-                    except:
-                        pass
-                    
-                    # Метод 2: Якщо не спрацювало - JavaScript з classList
-                    if "active" not in tab.get_attribute("class"):
-                        driver.execute_script("""
-                            var tabs = document.querySelectorAll('.discon-fact-table');
-                            tabs.forEach(t => t.classList.remove('active'));
-                            arguments[0].classList.add('active');
-                        """, tab)
-                        time.sleep(0.5)
+        for index, (group, address) in enumerate(shard):
+            budget = group_budget(len(shard) - index, clock)
+            if budget < GROUP_BUDGET_MIN:
+                skipped = [g for g, _ in shard[index:]]
+                METRICS.count("groups_skipped", len(skipped))
+                print(f"    ⏰ Немає часу на {', '.join(skipped)} — лишаються з останніх добрих даних")
+                break
+            
+            print(f"📍 Група {group}: {address_label(address)} (бюджет {budget:.0f}с)...")
+            
+            with METRICS.span("group", parent=parent, group=group, path="selenium") as span, RECORDER.context(group):
+                job = None
+                service = None
+                try:
+                    if driver is None:
+                        driver = DRIVERS.take()
+                        page_city = None
+                    service = driver.service if driver else Service()
                     
-            except Exception as e:
-                pass
-        
-        # Знаходимо активну таблицю
-        active_table = driver.find_element(By.CSS_SELECTOR, ".discon-fact-table.active table")
-        cells = active_table.find_elements(By.CSS_SELECTOR, "tbody td[class*='cell-']")
-        
-        for i, cell in enumerate(cells[:24]):
-            cls = cell.get_attribute("class")
-            first = "cell-scheduled" in cls and "maybe" not in cls
-            second = first
-            if "cell-first-half" in cls:
-                first, second = True, False
-            if "cell-second-half" in cls:
-                first, second = False, True
-            slots[i * 2] = first
-            slots[i * 2 + 1] = second
+                    # Запуск Chrome теж під watchdog: зависле створення сесії вбивається разом з chromedriver.
+                    # Сторінку можна перевикористати лише в тому ж місті
+                    with WATCHDOG.guard(budget, lambda s=service, g=group: kill(s, g), group) as job:
+                        if driver is None:
+                            driver = setup_driver(service=service)
+                        slots_today, slots_tomorrow, msg, emergency = scrape_dtek_group(
+                            driver, group, address, reuse_page=page_city == address[0] and DTEK_SESSION_REUSE
+                        )
+                    page_city = address[0] if slots_today is not None else None
+                    if job["killed"]:
+                        # Вбитий браузер міг "дожити" до кінця скрапу, але його дані вже не варті довіри
+                        raise TimeoutError(f"бюджет {budget:.0f}с вичерпано")
+                except Exception as e:
+                    killed = job is not None and job["killed"]
+                    print(f"    ❌ {group}: {e}")
+                    span.tag(outcome="killed" if killed else "error", error=str(e))
+                    RECORDER.record("error", error=repr(e))
+                    # Знімок з мертвого браузера не зробити — лише кільце
+                    RECORDER.dump("watchdog" if killed else "error", None if killed else driver)
+                    # Браузер міг впасти або зависнути — вбиваємо (quit() на завислому висить сам),
+                    # наступна група стартує з новим
+                    page_city = None
+                    if driver:
+                        METRICS.count("browser_restarts")
+                    kill_service(service)
+                    driver = None
+                    continue
                 
+                if slots_today is None:
+                    span.tag(outcome="failed")
+            
+            # Зберігаємо popup повідомлення (тільки перший раз)
+            if msg and not result["announcement"]:
+                result["announcement"] = msg
+                result["emergency"] = emergency
+            if msg and progress:
+                progress.announce(msg, emergency)
+            
+            if slots_today is None:
+                continue
+            
+            result["failed"].remove(group)
+            
+            today_mask = slots_to_mask(slots_today)
+            if progress:
+                progress.add(group, today_mask, slots_to_mask(slots_tomorrow) if slots_tomorrow is not None else None)
+            if today_mask:
+                result["today"][group] = today_mask
+                total = mask_minutes(today_mask)
+                print(f"    📊 {group} сьогодні: {mask_to_intervals(today_mask)} ({total // 60}год {total % 60:02d}хв)")
+            else:
+                print(f"    📊 {group} сьогодні: відключень немає")
+            
+            if slots_tomorrow is None:
+                result["unpublished"]["tomorrow"].append(group)
+                print(f"    📅 {group} завтра: графік ще не опубліковано")
+                continue
+            
+            tomorrow_mask = slots_to_mask(slots_tomorrow)
+            if tomorrow_mask:
+                result["tomorrow"][group] = tomorrow_mask
+                total = mask_minutes(tomorrow_mask)
+                print(f"    📅 {group} завтра: {mask_to_intervals(tomorrow_mask)} ({total // 60}год {total % 60:02d}хв)")
+            else:
+                print(f"    📅 {group} завтра: відключень немає")
+    
     except Exception as e:
-        pass
+        print(f"    ❌ DTEK worker error: {e}")
     
-    return slots
+    finally:
+        if driver:
+            DRIVERS.release(driver)
+    
+    return result
 
 
-def main():
-    print("=" * 60)
-    print("🚀 DTEK + YASNO Schedule Parser")
-    print("=" * 60)
+def plan_dtek_scrapes(groups, cache):
+    """Одна форма на чергу, а не на адресу: [(група, адреса), ...]
     
-    now = datetime.now()
-    today = now.strftime("%d.%m.%Y")
-    tomorrow = (now + timedelta(days=1)).strftime("%d.%m.%Y")
+    Усі адреси однієї черги дають ту саму таблицю, тож скрапиться лише одна.
+    Групи без придатної адреси (всі адреси належать іншим чергам) не потрапляють у план.
+    """
+    jobs = []
+    for group in groups:
+        address, _ = group_address(group, cache)
+        if address is None:
+            print(f"   ⚠️ {group}: немає адреси з цієї черги")
+            continue
+        jobs.append((group, address))
+    return jobs
+
+
+def merge_worker_result(result, shard, part):
+    """Додає результат dtek_worker у загальний; announcement — від першого, хто його побачив"""
+    for day in ("today", "tomorrow"):
+        result[day].update(part[day])
     
-    print(f"\n📅 Сьогодні: {today}")
-    print(f"📋 DTEK груп: {len(DTEK_GROUPS)}")
-    print(f"📋 YASNO груп: {len(YASNO_GROUPS)}\n")
+    done = {g for g, _ in shard} - set(part["failed"])
+    result["failed"] = [g for g in result["failed"] if g not in done]
+    for day, groups in part["unpublished"].items():
+        result["unpublished"].setdefault(day, []).extend(groups)
     
+    if part["announcement"] and not result["announcement"]:
+        result["announcement"] = part["announcement"]
+        result["emergency"] = part["emergency"]
+
+
+def fetch_dtek_schedule_selenium(groups=None, workers=None, cache=None, clock=None, progress=None):
+    """Парсить групи DTEK пулом браузерів (DTEK_WORKERS). Падіння одного воркера не зачіпає інші групи"""
+    groups = list(groups or DTEK_GROUPS)
+    clock = clock or RunClock()
     result = {
-        "timezone": "Europe/Kyiv",
-        "updated": now.strftime("%Y-%m-%d %H:%M:%S"),
-        "source": "dtek-dnem.com.ua + yasno.com.ua",
-        "emergency": None,
-        "today": {"date": today, "groups": {}},
-        "tomorrow": {"date": tomorrow, "groups": {}}
+        "today": {}, "tomorrow": {}, "announcement": None, "emergency": False,
+        "failed": list(groups), "unpublished": {},
     }
     
-    # === DTEK (Selenium) ===
-    print("=" * 40)
-    print("📡 DTEK (групи 1.x, 3.x, 5.x)")
-    print("=" * 40)
+    if webdriver is None:
+        print("   ❌ Selenium не встановлено")
+        return result
     
-    driver = None
+    cache = cache if cache is not None else load_address_cache()
+    groups = plan_dtek_scrapes(groups, cache)
+    if not groups:
+        return result
     
-    try:
-        driver = setup_driver()
+    workers = max(1, min(workers or DTEK_WORKERS, len(groups)))
+    shards = [groups[i::workers] for i in range(workers)]
+    
+    print(f"🧵 Воркерів: {workers}")
+    
+    parent = METRICS.current()
+    
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(dtek_worker, shard, parent, clock, progress) for shard in shards]
         
-        popup_message = None
-        is_emergency = False
+        # Зливаємо в порядку шардів, щоб announcement брався з першого (як раніше)
+        for shard, future in zip(shards, futures):
+            try:
+                merge_worker_result(result, shard, future.result())
+            except Exception as e:
+                print(f"    ❌ DTEK worker crashed: {e}")
+    
+    # Повторюємо лише групи, що впали, поки є бюджет форм і час — решта не чіпається
+    budget = DTEK_RETRY_BUDGET
+    while result["failed"] and budget > 0 and group_budget(1, clock) >= GROUP_BUDGET_MIN:
+        retry = plan_dtek_scrapes(result["failed"][:budget], cache)
+        if not retry:
+            break
+        budget -= len(retry)
+        METRICS.count("group_retries", len(retry))
+        print(f"   🔁 Повтор: {', '.join(g for g, _ in retry)}")
+        merge_worker_result(result, retry, dtek_worker(retry, parent, clock, progress))
+    
+    # Стабільний порядок груп у JSON незалежно від того, хто що встиг
+    for day in ("today", "tomorrow"):
+        result[day] = {g: result[day][g] for g in DTEK_GROUPS if g in result[day]}
+    
+    if result["announcement"]:
+        print(f"    📢 {result['announcement']}")
+        if result["emergency"]:
+            print(f"    ⚠️ ЕКСТРЕНЕ!")
+    
+    print(f"   ✅ DTEK (Selenium): {len(result['today'])} груп")
+    
+    return result
+
+
+def fetch_dtek_schedule(state=None, clock=None, progress=None):
+    """DTEK згідно з DTEK_SOURCE: HTTP-шлях, а Selenium — лише для груп, які HTTP не віддав
+    
+    state — стан попереднього запуску. Якщо відбиток сторінки не змінився, повертає {"unchanged": True}
+    без жодного скрапінгу. Новий відбиток записується в state лише коли всі групи отримано;
+    групи, які так і не вдалось отримати, — в 'missing'. clock — дедлайн запуску для бюджетів груп Selenium,
+    progress (SourceProgress) — куди складаються готові групи, поки джерело ще працює.
+    """
+    state = state if state is not None else {}
+    session = http_session()
+    
+    # Сторінку тягнемо навіть у режимі selenium — вона дає дешевий відбиток для пропуску скрапінгу
+    page = fetch_dtek_page(session)
+    fingerprint = dtek_fingerprint(page[0], page[2]) if page else None
+    
+    if fingerprint and fingerprint == state.get("dtek", {}).get("fingerprint"):
+        print("   💤 DTEK: без змін")
+        return {"today": {}, "tomorrow": {}, "announcement": None, "emergency": False, "unchanged": True}
+    
+    # Черги адрес — з кешу; AJAX лише для нових адрес і тих, у кого сплив TTL
+    cache = load_address_cache()
+    if resolve_addresses(session, page, cache):
+        save_address_cache(cache)
+    
+    if DTEK_SOURCE == "selenium":
+        report_address_mismatches(cache)
+        result = fetch_dtek_schedule_selenium(cache=cache, clock=clock, progress=progress)
+        missing = result.pop("failed")
+    else:
+        result = fetch_dtek_schedule_http(session, page, cache)
+        missing = result.pop("missing")
         
-        for group, street in DTEK_GROUPS.items():
-            print(f"📍 Група {group}: {street}...")
-            
-            driver.get(DTEK_URL)
-            time.sleep(3)
-            
-            success, msg, emergency = fill_form(driver, street)
-            
-            # Зберігаємо popup повідомлення (тільки перший раз)
-            if msg and not popup_message:
-                popup_message = msg
-                is_emergency = emergency
-                print(f"    📢 {msg}")
-                if is_emergency:
-                    print(f"    ⚠️ ЕКСТРЕНЕ!")
+        if progress:
+            progress.announce(result["announcement"], result["emergency"])
+            for group in DTEK_GROUPS:
+                if group not in missing:
+                    unpublished = group in result["unpublished"]["tomorrow"]
+                    progress.add(group, result["today"].get(group, 0), None if unpublished else result["tomorrow"].get(group, 0))
+        
+        if missing and DTEK_SOURCE != "http":
+            print(f"   🔁 Selenium fallback: {', '.join(missing)}")
+            fallback = fetch_dtek_schedule_selenium(missing, cache=cache, clock=clock, progress=progress)
+            missing = fallback["failed"]
             
-            if success:
-                # Парсимо сьогодні
-                slots_today = parse_schedule(driver, "today")
-                
-                if any(slots_today):
-                    intervals = slots_to_intervals(slots_today)
-                    result["today"]["groups"][group] = intervals
-                    total = sum(slots_today) * 30
-                    print(f"    📊 Сьогодні: {intervals} ({total // 60}год {total % 60:02d}хв)")
-                else:
-                    print(f"    📊 Сьогодні: відключень немає")
-                
-                # Парсимо завтра
-                slots_tomorrow = parse_schedule(driver, "tomorrow")
-                
-                if any(slots_tomorrow):
-                    intervals = slots_to_intervals(slots_tomorrow)
-                    result["tomorrow"]["groups"][group] = intervals
-                    total = sum(slots_tomorrow) * 30
-                    print(f"    📅 Завтра: {intervals} ({total // 60}год {total % 60:02d}хв)")
-                else:
-                    print(f"    📅 Завтра: відключень немає")
-            else:
-                print(f"    ⚠️ Form failed")
+            for day in ("today", "tomorrow"):
+                result[day].update(fallback[day])
+                result[day] = {g: result[day][g] for g in DTEK_GROUPS if g in result[day]}
+            for day, groups in fallback["unpublished"].items():
+                result["unpublished"].setdefault(day, []).extend(groups)
             
-            # Debug screenshot (only first)
-            if group == "1.1":
-                try:
-                    driver.save_screenshot("debug_page.png")
-                    with open("debug_page.html", "w", encoding="utf-8") as f:
-                        f.write(driver.page_source)
-                except:
-                    pass
+            if fallback["announcement"] and not result["announcement"]:
+                result["announcement"] = fallback["announcement"]
+                result["emergency"] = fallback["emergency"]
+    
+    if fingerprint and not missing:
+        state["dtek"] = {"fingerprint": fingerprint}
+    
+    result["missing"] = missing
+    return result
+
+
+def load_state():
+    """Стан між запусками (відбитки джерел, ETag). Живе в CACHE_DIR, не в git"""
+    try:
+        with open(STATE_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except:
+        return {}
+
+
+def save_state(state):
+    try:
+        os.makedirs(os.path.dirname(STATE_FILE) or ".", exist_ok=True)
+        with open(STATE_FILE, "w", encoding="utf-8") as f:
+            json.dump(state, f, ensure_ascii=False, indent=2)
+    except Exception as e:
+        print(f"⚠️ State error: {e}")
+
+
+def load_schedule():
+    try:
+        with open(SCHEDULE_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except:
+        return None
+
+
+def load_previous_schedule(today):
+    """Попередній schedule.json, якщо він за ту саму дату — з нього беремо дані незмінених джерел"""
+    previous = load_schedule()
+    if previous and previous.get("today", {}).get("date") == today:
+        return previous
+    return None
+
+
+def reuse_previous_groups(result, previous, groups):
+    """Копіює групи незміненого джерела (разом з їхніми stale_since і unpublished) з попереднього schedule.json"""
+    for day in ("today", "tomorrow"):
+        for group, intervals in previous[day]["groups"].items():
+            if group in groups:
+                result[day]["groups"][group] = intervals_to_mask(intervals)
+        for group, since in previous[day].get("stale_since", {}).items():
+            if group in groups:
+                result[day].setdefault("stale_since", {})[group] = since
+        mark_unpublished(result[day], [g for g in previous[day].get("unpublished", []) if g in groups])
+
+
+def seed_from_previous(result, previous):
+    """Групи всіх джерел, оголошення і stale з попереднього schedule.json — основа, на яку кожне джерело
+    лягає, щойно прийшло: графік можна публікувати, не чекаючи решти джерел"""
+    for groups in (DTEK_GROUPS, YASNO_GROUPS):
+        reuse_previous_groups(result, previous, groups)
+    for key in ("announcement", "emergency", "stale"):
+        if previous.get(key) is not None:
+            result[key] = copy.deepcopy(previous[key])
+
+
+def mark_unpublished(day, groups):
+    """Додає групи в day["unpublished"] — графіка групи на цей день немає (не опубліковано або не отримано)"""
+    current = set(day.get("unpublished", [])) | set(groups)
+    if current:
+        day["unpublished"] = [g for g in ALL_GROUPS if g in current] + sorted(current - set(ALL_GROUPS))
+
+
+def load_group_cache():
+    try:
+        with open(GROUP_CACHE_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except:
+        return {}
+
+
+def save_group_cache(cache, result):
+    """Зберігає кеш груп лише за дні поточного результату — старші дати вже не знадобляться"""
+    dates = {result[day]["date"] for day in ("today", "tomorrow")}
+    try:
+        os.makedirs(os.path.dirname(GROUP_CACHE_FILE) or ".", exist_ok=True)
+        with open(GROUP_CACHE_FILE, "w", encoding="utf-8") as f:
+            json.dump({d: v for d, v in cache.items() if d in dates}, f, ensure_ascii=False, indent=2)
+    except Exception as e:
+        print(f"⚠️ Group cache error: {e}")
+
+
+def remember_groups(cache, result, data, groups):
+    """Записує в кеш групи, які джерело віддало. Група без відключень — теж добрий результат, неопублікована — ні"""
+    fetched = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    for day in ("today", "tomorrow"):
+        entries = cache.setdefault(result[day]["date"], {})
+        unpublished = data.get("unpublished", {}).get(day, [])
+        for group in groups:
+            if group not in data["missing"] and group not in unpublished:
+                entries[group] = {"intervals": mask_to_intervals(data[day].get(group, 0)), "fetched": fetched}
+
+
+def restore_missing_groups(cache, result, missing):
+    """Групи, яких джерело не віддало, — з кешу, з позначкою stale_since (час останніх добрих даних)
+    
+    Групи без запису в кеші на цей день позначаються unpublished — їх графік невідомий.
+    """
+    restored = []
+    for day in ("today", "tomorrow"):
+        for group in missing:
+            entry = cache.get(result[day]["date"], {}).get(group)
+            if entry is None:
+                mark_unpublished(result[day], [group])
+                continue
+            mask = intervals_to_mask(entry["intervals"])
+            if mask:
+                result[day]["groups"][group] = mask
+            result[day].setdefault("stale_since", {})[group] = entry["fetched"]
+            restored.append(group)
+    
+    if restored:
+        METRICS.count("stale_groups", len(set(restored)))
+        print(f"   ♻️ Останні добрі дані: {', '.join(dict.fromkeys(restored))}")
+
+
+def serialize_result(result):
+    """Копія результату для JSON: маски груп -> рядки інтервалів (без горизонту тижня — він іде в week.json)"""
+    output = dict(result)
+    output.pop("week", None)
+    for day in ("today", "tomorrow"):
+        output[day] = dict(result[day])
+        groups = result[day]["groups"]
+        # Джерела приходять у довільному порядку — в JSON групи завжди в одному порядку
+        order = [g for g in ALL_GROUPS if g in groups] + [g for g in groups if g not in ALL_GROUPS]
+        output[day]["groups"] = {g: mask_to_intervals(groups[g]) for g in order}
+    return output
+
+
+def kyiv_timestamp(date, minute):
+    """'dd.mm.yyyy' + хвилина від його початку (може бути > 1440) -> unix timestamp за київським часом"""
+    moment = datetime.strptime(date, "%d.%m.%Y") + timedelta(minutes=minute)
+    return int(moment.replace(tzinfo=KYIV).timestamp())
+
+
+def build_transition_index(result):
+    """Маски сьогодні+завтра -> {група: [off, on, off, on, ...]} в unix timestamps
+    
+    Світла немає, коли bisect_right(межі, t) непарний. Вікно кожної групи закінчується на першому дні,
+    де її графік не опубліковано (unpublished) — ends[група]; завтра однієї групи не додається іншим.
+    Відключення, що триває до кінця вікна групи, не має закриваючої межі (коли дадуть світло — невідомо).
+    """
+    days = [result["today"], result["tomorrow"]]
+    first = days[0]["date"]
+    
+    names = set().union(*(day["groups"] for day in days), *(day.get("unpublished", []) for day in days))
+    order = ALL_GROUPS + sorted(names - set(ALL_GROUPS))
+    
+    groups = {}
+    ends = {}
+    for group in order:
+        known = 0
+        combined = 0
+        for day in days:
+            if group in day.get("unpublished", []):
+                break
+            combined |= day["groups"].get(group, 0) << (1440 * known)
+            known += 1
+        end = kyiv_timestamp(first, 1440 * known)
         
-        # Зберігаємо popup повідомлення в результат
-        if popup_message:
-            result["announcement"] = popup_message
-            if is_emergency:
-                result["emergency"] = popup_message
+        bounds = []
+        for start, stop in mask_runs(combined):
+            bounds += [kyiv_timestamp(first, start), kyiv_timestamp(first, stop)]
+        if bounds and bounds[-1] == end:
+            bounds.pop()
+        groups[group] = bounds
+        ends[group] = end
+    
+    start = kyiv_timestamp(first, 0)
+    return {
+        "timezone": "Europe/Kyiv",
+        "updated": result["updated"],
+        "start": start,
+        "end": max(ends.values(), default=start),
+        "ends": ends,
+        "groups": groups,
+    }
+
+
+def content_hash(output):
+    """Хеш змісту schedule.json без VOLATILE_FIELDS — однаковий для однакових графіків"""
+    content = {k: v for k, v in output.items() if k not in VOLATILE_FIELDS}
+    payload = json.dumps(content, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def schedule_delta(previous, output):
+    """Зміни між двома schedule.json: додані/зняті інтервали по (дата, група) і зміни popup
+    
+    Дні порівнюються за датою, тож після півночі вчорашнє "завтра" порівнюється з новим "сьогодні".
+    """
+    before = {}
+    for day in ("today", "tomorrow"):
+        if previous and day in previous:
+            before[previous[day]["date"]] = previous[day]["groups"]
+    
+    changes = []
+    for day in ("today", "tomorrow"):
+        date = output[day]["date"]
+        old_groups = before.get(date, {})
+        new_groups = output[day]["groups"]
+        names = set(old_groups) | set(new_groups)
         
-    except Exception as e:
-        print(f"\n❌ DTEK Error: {e}")
-        import traceback
-        traceback.print_exc()
+        for group in [g for g in ALL_GROUPS if g in names] + sorted(names - set(ALL_GROUPS)):
+            old = intervals_to_mask(old_groups.get(group))
+            new = intervals_to_mask(new_groups.get(group))
+            if old == new:
+                continue
+            changes.append({
+                "type": "intervals",
+                "day": day,
+                "date": date,
+                "group": group,
+                "added": mask_to_intervals(mask_diff(new, old)),
+                "removed": mask_to_intervals(mask_diff(old, new)),
+            })
+    
+    for field in ("announcement", "emergency"):
+        old = (previous or {}).get(field)
+        new = output.get(field)
+        if old != new:
+            changes.append({"type": field, "old": old, "new": new})
+    
+    return changes
+
+
+def append_changes(record):
+    with open(CHANGES_FILE, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n")
+
+
+def write_json_atomic(path, data, **kwargs):
+    """Запис через тимчасовий файл — читачі з hot reload ніколи не бачать напівзаписаний JSON"""
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, **kwargs)
+    os.replace(tmp, path)
+
+
+# === Оркестрація джерел ===
+
+class SourceProgress:
+    """Групи, які джерело вже отримало, — щоб вони пережили таймаут джерела
+    
+    Фетчер викликає add() на кожну готову групу (з будь-якого потоку). Якщо джерело не вклалось
+    у дедлайн, run_sources віддає snapshot(): готові групи публікуються, решта береться з кешу.
+    """
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.data = {"today": {}, "tomorrow": {}, "unpublished": {}, "done": [], "announcement": None, "emergency": False}
+    
+    def add(self, group, today, tomorrow):
+        """Маски групи; tomorrow = None — графік на завтра не опубліковано"""
+        with self.lock:
+            if today:
+                self.data["today"][group] = today
+            if tomorrow is None:
+                self.data["unpublished"].setdefault("tomorrow", []).append(group)
+            elif tomorrow:
+                self.data["tomorrow"][group] = tomorrow
+            self.data["done"].append(group)
+    
+    def announce(self, announcement, emergency):
+        """Перше побачене оголошення, як у merge_worker_result"""
+        with self.lock:
+            if announcement and not self.data["announcement"]:
+                self.data["announcement"] = announcement
+                self.data["emergency"] = emergency
+    
+    def snapshot(self):
+        """Копія готового з позначкою "partial", або None, якщо готового нічого немає"""
+        with self.lock:
+            if not self.data["done"]:
+                return None
+            return dict(copy.deepcopy(self.data), partial=True)
+
+
+def timed_out_data(name, partial=None):
+    """Дані джерела, яке впало або не вклалось у дедлайн: готові групи з partial, решта — в missing (з кешу)"""
+    groups = DTEK_GROUPS if name == "dtek" else YASNO_GROUPS
+    data = partial or {"today": {}, "tomorrow": {}}
+    data["missing"] = [g for g in groups if g not in data.get("done", ())]
+    return data
+
+
+def run_sources(sources, state, clock):
+    """Запускає джерела одночасно і віддає (name, data) по мірі готовності
+    
+    Кожне джерело — у своєму daemon-потоці зі своїм дедлайном (SOURCE_DEADLINES, але не пізніше
+    дедлайну запуску clock мінус PUBLISH_RESERVE). Якщо джерело впало, для нього віддається (name, None);
+    якщо не вклалось у дедлайн — (name, знімок SourceProgress з готовими групами або None).
+    Решта джерел на нього не чекає.
+    
+    Джерело пише у власну копію state; state[name] оновлюється лише з результату, прийнятого вчасно —
+    покинутий потік, що допрацює пізніше, не змінить ні state, ні дедлайни наступного запуску.
+    """
+    results = queue.Queue()
+    
+    def runner(name, fetch, local, progress):
+        try:
+            with METRICS.span("source", source=name) as span:
+                data = fetch(local, clock, progress)
+                if data and data.get("unchanged"):
+                    span.tag(outcome="unchanged")
+            results.put((name, data, local, None))
+        except Exception as e:
+            results.put((name, None, local, e))
+    
+    start = time.monotonic()
+    limit = clock.remaining(PUBLISH_RESERVE)
+    budgets = {name: max(0, min(SOURCE_DEADLINES.get(name, 300), limit)) for name in sources}
+    deadlines = {name: start + budgets[name] for name in sources}
+    
+    progress = {name: SourceProgress() for name in sources}
+    for name, fetch in sources.items():
+        thread = threading.Thread(
+            target=runner, args=(name, fetch, copy.deepcopy(state), progress[name]), name=f"source-{name}", daemon=True
+        )
+        SOURCE_RUNNERS[name] = thread
+        thread.start()
+    
+    pending = set(sources)
+    while pending:
+        timeout = min(deadlines[n] for n in pending) - time.monotonic()
+        try:
+            name, data, local, error = results.get(timeout=max(0, timeout))
+        except queue.Empty:
+            now = time.monotonic()
+            for name in [n for n in pending if now >= deadlines[n]]:
+                pending.discard(name)
+                METRICS.count("source_timeouts")
+                print(f"\n⏰ {name}: не вклалось у {budgets[name]:.0f}с — публікуємо те, що встигло")
+                RECORDER.dump(f"deadline-{name}")
+                yield name, progress[name].snapshot()
+            continue
         
-    finally:
-        if driver:
-            driver.quit()
+        if name not in pending:
+            continue
+        pending.discard(name)
+        
+        if error is not None:
+            print(f"\n❌ {name} error: {error}")
+            traceback.print_exception(type(error), error, error.__traceback__)
+        else:
+            print(f"\n✅ {name}: {time.monotonic() - start:.1f}с")
+            if name in local:
+                state[name] = local[name]
+        yield name, data
+
+
+def merge_source(result, name, data, previous, group_cache=None):
+    """Додає дані джерела в результат. Незмінене джерело бере свої групи з попереднього schedule.json
     
-    # === YASNO API ===
-    print("\n" + "=" * 40)
-    print("📡 YASNO API (групи 2.x, 4.x, 6.x)")
-    print("=" * 40)
+    group_cache — кеш останніх добрих даних груп: оновлюється отриманими групами,
+    а групи з data["missing"] беруться з нього замість того, щоб зникнути.
+    """
+    groups = DTEK_GROUPS if name == "dtek" else YASNO_GROUPS
     
-    yasno_data = fetch_yasno_schedule()
+    if data.get("unchanged"):
+        # У --watch результат уже містить ці групи — попередній файл не потрібен
+        if previous is None:
+            return
+        reuse_previous_groups(result, previous, groups)
+        if name == "dtek":
+            data["announcement"] = previous.get("announcement")
+            data["emergency"] = bool(previous.get("emergency"))
+    else:
+        # Нові дані джерела повністю замінюють старі (група без відключень просто відсутня)
+        for day in ("today", "tomorrow"):
+            stale_since = result[day].get("stale_since", {})
+            for group in groups:
+                result[day]["groups"].pop(group, None)
+                stale_since.pop(group, None)
+            if not stale_since:
+                result[day].pop("stale_since", None)
+            
+            unpublished = [g for g in result[day].pop("unpublished", []) if g not in groups]
+            mark_unpublished(result[day], unpublished + data.get("unpublished", {}).get(day, []))
+        if name == "dtek":
+            # Джерело нічого не віддало (впало, дедлайн) — оголошення попереднє, як і групи з кешу.
+            # Частковий результат без оголошення теж: popup могли просто ще не побачити
+            complete = not data.get("partial") and not set(groups) <= set(data.get("missing", ()))
+            delivered = data.get("announcement") or complete
+            if delivered:
+                result.pop("announcement", None)
+                result["emergency"] = None
+            elif previous is not None:
+                data["announcement"] = previous.get("announcement")
+                data["emergency"] = bool(previous.get("emergency"))
+    
+    for day in ("today", "tomorrow"):
+        for group, mask in data[day].items():
+            result[day]["groups"][group] = mask
+    
+    # Незмінене джерело нічого не віддало — кеш не чіпаємо, stale_since приходить з попереднього графіка
+    if group_cache is not None and "missing" in data and not data.get("unchanged"):
+        remember_groups(group_cache, result, data, groups)
+        restore_missing_groups(group_cache, result, data["missing"])
+    
+    # Джерело віддало кешовану відповідь — позначаємо, з якого часу дані
+    if data.get("stale"):
+        result.setdefault("stale", {})[name] = data["stale"]
+    elif name in result.get("stale", {}):
+        del result["stale"][name]
+        if not result["stale"]:
+            del result["stale"]
     
-    # Додаємо YASNO графіки до результату
-    for group, intervals in yasno_data["today"].items():
-        result["today"]["groups"][group] = intervals
+    # Горизонт тижня YASNO — для week.json у publish()
+    if data.get("week"):
+        result["week"] = data["week"]
     
-    for group, intervals in yasno_data["tomorrow"].items():
-        result["tomorrow"]["groups"][group] = intervals
+    # Зберігаємо popup повідомлення в результат
+    if data.get("announcement"):
+        result["announcement"] = data["announcement"]
+        if data.get("emergency"):
+            result["emergency"] = data["announcement"]
+
+
+def new_result(now):
+    """Порожній каркас schedule.json на дату now"""
+    return {
+        "timezone": "Europe/Kyiv",
+        "updated": now.strftime("%Y-%m-%d %H:%M:%S"),
+        "source": "dtek-dnem.com.ua + yasno.com.ua",
+        "emergency": None,
+        "today": {"date": now.strftime("%d.%m.%Y"), "groups": {}},
+        "tomorrow": {"date": (now + timedelta(days=1)).strftime("%d.%m.%Y"), "groups": {}}
+    }
+
+
+def publish(result, state):
+    """Записує schedule.json, індекс і стрічку змін — лише якщо зміст змінився. Повертає True, якщо записано
+    
+    week.json пишеться, якщо YASNO віддав новий тиждень, навіть коли schedule.json не змінився:
+    тиждень може змінитись за межами сьогодні/завтра.
+    """
+    week = result.pop("week", None)
+    if week:
+        write_week_file(week["horizon"], week["hash"], week["stale"])
+    
+    output = serialize_result(result)
+    
+    # Історія — до прогнозу: інакше прогноз змінився б лише наступним запуском і дав би зайвий перезапис.
+    # save_history сам нічого не пише, якщо сьогоднішні групи ті самі
+    with METRICS.span("step", step="history"):
+        save_history(output)
+    
+    with METRICS.span("step", step="forecast"):
+        add_forecast(output)
+    
+    output["hash"] = content_hash(output)
+    
+    previous = load_schedule()
+    if previous and content_hash(previous) == output["hash"]:
+        save_state(state)
+        print("\n💤 Зміст графіка не змінився — schedule.json не чіпаємо")
+        return False
     
     # === Зберігаємо результат ===
-    with open(SCHEDULE_FILE, "w", encoding="utf-8") as f:
-        json.dump(result, f, ensure_ascii=False, indent=2)
+    changes = schedule_delta(previous, output)
+    write_json_atomic(SCHEDULE_FILE, output, indent=2)
+    write_json_atomic(TRANSITIONS_FILE, build_transition_index(result), separators=(",", ":"))
     
-    # Зберігаємо історію для прогнозування
-    save_history(result)
+    with METRICS.span("step", step="dist"):
+        groups = set(result["today"]["groups"]) | set(result["tomorrow"]["groups"])
+        order = ALL_GROUPS + sorted(groups - set(ALL_GROUPS))
+        written = write_dist(DIST_DIR, output, (result["today"]["groups"], result["tomorrow"]["groups"]), order)
+        print(f"📦 {DIST_DIR}: оновлено файлів {written}")
+    
+    if changes:
+        append_changes({
+            "updated": output["updated"],
+            "hash": output["hash"],
+            "previous": previous.get("hash") if previous else None,
+            "changes": changes,
+        })
+        print(f"📝 Змін: {len(changes)}")
+    
+    save_state(state)
     
     print(f"\n💾 Збережено: {SCHEDULE_FILE}")
     print(f"📊 Сьогодні: {len(result['today']['groups'])} груп")
     print(f"📅 Завтра: {len(result['tomorrow']['groups'])} груп")
+    return True
+
+
+def run_once():
+    clock = RunClock()
+    clock.start(RUN_BUDGET)
+    with METRICS.span("run", mode="once") as span:
+        published = collect_and_publish(clock)
+        if not published:
+            span.tag(outcome="unchanged")
+
+
+def collect_and_publish(clock):
+    """Один повний прохід по джерелах з дедлайном clock. Повертає True, якщо schedule.json перезаписано
+    
+    Якщо є сьогоднішній schedule.json, кожне змінене джерело публікується одразу, як прийшло:
+    групи джерел, що ще працюють, до того лишаються з попереднього графіка. Без нього — один запис у кінці.
+    """
+    now = datetime.now()
+    result = new_result(now)
+    today = result["today"]["date"]
+    
+    print(f"\n📅 Сьогодні: {today}")
+    print(f"📋 DTEK груп: {len(DTEK_GROUPS)}")
+    print(f"📋 YASNO груп: {len(YASNO_GROUPS)}\n")
+    
+    # Відбитки джерел мають сенс лише в межах доби і коли є що перевикористати
+    state = load_state()
+    previous = load_previous_schedule(today)
+    if state.get("date") != today or previous is None:
+        state = {"date": today}
+    
+    # === DTEK і YASNO паралельно ===
+    print("=" * 40)
+    print("📡 DTEK (групи 1.x, 3.x, 5.x) + YASNO (групи 2.x, 4.x, 6.x)")
+    print("=" * 40)
+    
+    sources = {"dtek": fetch_dtek_schedule, "yasno": fetch_yasno_schedule}
+    unchanged = set()
+    published = False
+    group_cache = load_group_cache()
+    if previous is not None:
+        seed_from_previous(result, previous)
+    
+    for name, data in run_sources(sources, state, clock):
+        if data is None or data.get("partial"):
+            # Джерело впало або не вклалось у дедлайн — готові групи його, решта з кешу
+            data = timed_out_data(name, data)
+        if data.get("unchanged"):
+            unchanged.add(name)
+        merge_source(result, name, data, previous, group_cache)
+        
+        if previous is not None and name not in unchanged:
+            print(f"\n📤 {name}: публікуємо одразу")
+            result["updated"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            save_group_cache(group_cache, result)
+            published = publish(result, state) or published
+    
+    save_group_cache(group_cache, result)
+    
+    if unchanged == set(sources):
+        save_state(state)
+        print("\n💤 Жодне джерело не змінилось — schedule.json не чіпаємо")
+        return False
+    
+    if previous is not None:
+        return published
+    return publish(result, state)
+
+
+def next_interval(interval, changed, emergency):
+    """Адаптивний інтервал опитування: щойно була зміна чи екстрене — якнайчастіше, тиша — відступ з джитером"""
+    if changed or emergency:
+        return WATCH_MIN_INTERVAL
+    interval = min(interval * WATCH_BACKOFF, WATCH_MAX_INTERVAL)
+    return interval * random.uniform(1 - WATCH_JITTER, 1 + WATCH_JITTER)
+
+
+def watch():
+    """Довготривалий режим: теплі браузер і HTTP-сесія, кожне джерело опитується за власним розкладом
+    
+    Змінене джерело публікується одразу, як прийшло, якщо решта груп уже є (з сьогоднішнього
+    schedule.json або попередніх опитувань). Інакше — після першого опитування всіх джерел.
+    """
+    sources = {"dtek": fetch_dtek_schedule, "yasno": fetch_yasno_schedule}
+    intervals = {name: WATCH_MIN_INTERVAL for name in sources}
+    next_poll = {name: 0.0 for name in sources}
+    result, state = None, {}
+    complete = False
+    group_cache = load_group_cache()
+    
+    print(f"👀 Watch: опитування кожні {WATCH_MIN_INTERVAL}–{WATCH_MAX_INTERVAL}с")
+    
+    while True:
+        now = datetime.now()
+        today = now.strftime("%d.%m.%Y")
+        
+        # Нова доба — все з нуля, всі джерела одразу
+        if result is None or result["today"]["date"] != today:
+            result = new_result(now)
+            previous = load_previous_schedule(today)
+            state = load_state()
+            if state.get("date") != today or previous is None:
+                state = {"date": today}
+            complete = previous is not None
+            if complete:
+                seed_from_previous(result, previous)
+            next_poll = {name: 0.0 for name in sources}
+        
+        due = {name: fetch for name, fetch in sources.items() if next_poll[name] <= time.monotonic()}
+        
+        # Покинутий по дедлайну запуск ще працює — не запускаємо джерело вдруге поруч з ним
+        for name in [n for n in due if SOURCE_RUNNERS.get(n) and SOURCE_RUNNERS[n].is_alive()]:
+            print(f"   ⏳ {name}: попереднє опитування ще не завершилось — пропускаємо")
+            del due[name]
+            next_poll[name] = time.monotonic() + WATCH_MIN_INTERVAL
+        changed = set()
+        
+        # Метрики файлу і самописець — про останнє опитування
+        METRICS.reset()
+        RECORDER.reset()
+        # Свій дедлайн у кожного опитування: покинуті потоки тримають старий і не зсувають новий
+        clock = RunClock()
+        clock.start(RUN_BUDGET)
+        with METRICS.span("run", mode="watch", sources=",".join(due)) as span:
+            for name, data in run_sources(due, state, clock):
+                if data is not None:
+                    if data.get("partial"):
+                        data = timed_out_data(name, data)
+                    if not data.get("unchanged"):
+                        changed.add(name)
+                    merge_source(result, name, data, load_previous_schedule(today), group_cache)
+                
+                if name in changed and complete:
+                    result["updated"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                    save_group_cache(group_cache, result)
+                    publish(result, state)
+                
+                intervals[name] = next_interval(intervals[name], name in changed, name == "dtek" and result.get("emergency"))
+                next_poll[name] = time.monotonic() + intervals[name]
+            
+            if changed and not complete:
+                result["updated"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                save_group_cache(group_cache, result)
+                publish(result, state)
+                complete = True
+            elif not changed and due:
+                span.tag(outcome="unchanged")
+                save_state(state)
+        
+        write_metrics()
+        
+        for name in due:
+            print(f"   ⏭️ {name}: наступне опитування через {intervals[name]:.0f}с")
+        
+        time.sleep(max(1.0, min(next_poll.values()) - time.monotonic()))
+
+
+def write_metrics():
+    try:
+        METRICS.write(METRICS_FILE, METRICS_PROM_FILE)
+    except Exception as e:
+        print(f"⚠️ Metrics error: {e}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="DTEK + YASNO Schedule Parser")
+    parser.add_argument("--watch", action="store_true", help="працювати постійно з адаптивним опитуванням")
+    args = parser.parse_args()
+    
+    print("=" * 60)
+    print("🚀 DTEK + YASNO Schedule Parser")
+    print("=" * 60)
+    
+    try:
+        if args.watch:
+            watch()
+        else:
+            run_once()
+    except KeyboardInterrupt:
+        print("\n🛑 Зупинено")
+    finally:
+        DRIVERS.close()
+        write_metrics()
+    
     print("👋 Done")
 
 